@@ -1,35 +1,26 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
 import datetime
-from app.db import get_connection
-from app.sponsorship import sponsorship_tab
-from app.events import events_tab
-from app.statistics import statistics_tab
-from app.admin import admin_tab
 
+# Tab modules (and the pandas/altair/DB driver imports they pull in) are imported in the
+# branch that renders them, so a rerun only pays for the selected tab.
+# ganesh.png is served as-is from static/ (see .streamlit/config.toml).
 
 st.set_page_config(page_title="Terrazzo Ganesh Celebrations 2025", page_icon="🙏", layout="wide")
-from PIL import Image
-ganesh_img = Image.open("ganesh.png")
 
 
 # ---------- Constants ----------
 
 ADMIN_USERNAME = st.secrets["admin_user"]
 ADMIN_PASSWORD_BASE = st.secrets["admin_pass"]
-import pytz
 def get_admin_password():
+    import pytz
     cst = pytz.timezone('US/Central')
     now_utc = datetime.datetime.now(pytz.utc)
     now_cst = now_utc.astimezone(cst)
     today_day = now_cst.strftime('%d')
     return f"{ADMIN_PASSWORD_BASE}{today_day}"
 
-# ---------- DB Setup ----------
-
-conn = get_connection()
-
-
 # ---------- Styling ----------
 st.markdown("""
 <style>
@@ -221,10 +212,12 @@ else:
         )
 
         if main_menu == "Contributions":
+            from app.sponsorship import sponsorship_tab
             sponsorship_tab()
         elif main_menu == "Events":
             if 'admin_full_name' not in st.session_state or not st.session_state['admin_full_name']:
                 st.session_state['admin_full_name'] = ''
+            from app.events import events_tab
             events_tab()
         elif main_menu == "Prasad Seva":
             from app.prasad_seva import prasad_seva_tab
@@ -232,6 +225,7 @@ else:
         elif main_menu == "Statistics":
             # Set is_admin flag for statistics
             st.session_state['is_admin'] = st.session_state.admin_logged_in
+            from app.statistics import statistics_tab
             statistics_tab()
         elif main_menu == "Expenses":
             from app.expenses import expenses_tab
@@ -239,17 +233,5 @@ else:
         elif st.session_state.admin_logged_in and main_menu == "Admin":
             if 'admin_full_name' not in st.session_state:
                 st.session_state.admin_full_name = ''
-            admin_menu = option_menu(
-                "Admin Sections",
-                [
-                    "Payment Details",
-                    "Sponsorship Record",
-                    "Sponsorship Items",
-                    "Manage Notification Emails"
-                ],
-                icons=["credit-card", "pencil-square", "list-task", "envelope-fill"],
-                menu_icon="gear",
-                default_index=0,
-                orientation="vertical"
-            )
-            admin_tab(menu=admin_menu)
+            from app.admin import admin_panel
+            admin_panel()
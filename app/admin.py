@@ -18,31 +18,48 @@ st.markdown('''
     </style>
 ''', unsafe_allow_html=True)
 import pandas as pd
+from streamlit_option_menu import option_menu
 from .db import get_connection
-from .email_utils import send_email
+from .cache import cached_fetchall, cached_read_sql, commit_and_invalidate
+from .outbox import enqueue_email
+
+@st.fragment
+def admin_panel():
+    # Sub-menu clicks and edits rerun only the admin panel, not the page menu and login checks
+    admin_menu = option_menu(
+        "Admin Sections",
+        [
+            "Payment Details",
+            "Sponsorship Record",
+            "Sponsorship Items",
+            "Manage Notification Emails"
+        ],
+        icons=["credit-card", "pencil-square", "list-task", "envelope-fill"],
+        menu_icon="gear",
+        default_index=0,
+        orientation="vertical"
+    )
+    admin_tab(menu=admin_menu)
+
 
 def admin_tab(menu="Sponsorship Items"):
+    with get_connection() as conn:
+        _admin_tab(conn, menu=menu)
+
+
+def _admin_tab(conn, menu="Sponsorship Items"):
     st.session_state['active_tab'] = 'Admin'
-    conn = get_connection()
     cursor = conn.cursor()
     # Always show Payment Details by default and display its tabs first
     if menu == "Payment Details" or menu is None:
         st.markdown("<h2 style='color: #6A1B9A;'>💳 Payment Details</h2>", unsafe_allow_html=True)
         def get_sponsor_df():
-            df = pd.read_sql("SELECT name, SUM(COALESCE(donation,0)) AS donation_sum FROM sponsors GROUP BY name", conn)
-            df.columns = [c.lower() for c in df.columns]
-            cursor2 = conn.cursor()
-            cursor2.execute("""
-                SELECT s.name, SUM(COALESCE(si.amount,0) / NULLIF(si.sponsor_limit,0))
-                FROM sponsors s
-                JOIN sponsorship_items si ON si.item = s.sponsorship
-                GROUP BY s.name
-            """)
-            sponsor_amt = {row[0]: float(row[1]) for row in cursor2.fetchall()}
-            df["sponsorship_sum"] = df["name"].map(sponsor_amt).fillna(0).astype(float)
-            df["donation_sum"] = df["donation_sum"].astype(float)
-            df["total_amount"] = df["donation_sum"] + df["sponsorship_sum"]
-            return df
+            df = cached_read_sql(conn, """
+                SELECT name, SUM(donation) AS donation_sum, SUM(slot_amount) AS sponsorship_sum, SUM(total_amount) AS total_amount
+                FROM sponsor_contributions
+                GROUP BY name
+            """, ("sponsors", "sponsorship_items"))
+            return df.astype({"donation_sum": float, "sponsorship_sum": float, "total_amount": float})
         sponsor_df = get_sponsor_df()
         sponsor_names = sorted(sponsor_df["name"].tolist())
         payment_tabs = ["Add Payment Detail", "Received", "Not Received", "Mismatch Records", "Delete Payment Detail"]
@@ -103,7 +120,7 @@ def admin_tab(menu="Sponsorship Items"):
                                     "INSERT INTO payment_details (name, amount, date, comments, payment_type, recieved_zelle_acc_name) VALUES (%s, %s, %s, %s, %s, %s)",
                                     (name, amount, date_cst, comments, payment_type, recieved_zelle_acc_name)
                                 )
-                            conn.commit()
+                            commit_and_invalidate(conn, "payment_details")
                             st.success("✅ Payment detail added!")
                             st.rerun()
                         except Exception as e:
@@ -144,12 +161,12 @@ def admin_tab(menu="Sponsorship Items"):
                 elif selected_type == "Zelle":
                     st.markdown(f"<div style='text-align:right; font-size:1.05em; margin-top:0.5em;'><b>Total Zelle Amount:</b> <span style='color:#388E3C;'>${zelle_total:,.2f}</span></div>", unsafe_allow_html=True)
                 if st.button("Send Payment Details Email"):
-                    cursor.execute("SELECT email FROM notification_emails")
-                    notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
+                    notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
                     if notification_emails:
                         html_table = display_df.to_html(index=False, border=1, justify='center')
                         try:
-                            send_email(
+                            enqueue_email(
+                                cursor,
                                 "Ganesh Chaturthi Payment Details",
                                 f"""
 <b>Payment Details (Received)</b><br><br>
@@ -158,9 +175,11 @@ def admin_tab(menu="Sponsorship Items"):
 """,
                                 notification_emails
                             )
-                            st.success(f"✅ Payment details sent to: {', '.join(notification_emails)}")
+                            conn.commit()
+                            st.success(f"✅ Payment details queued for: {', '.join(notification_emails)}")
                         except Exception as e:
-                            st.error(f"❌ Failed to send email: {e}")
+                            conn.rollback()
+                            st.error(f"❌ Failed to queue email: {e}")
                     else:
                         st.warning("No notification emails found.")
             else:
@@ -225,8 +244,7 @@ def admin_tab(menu="Sponsorship Items"):
                     if st.button("Delete Payment Detail"):
                         if confirm_name.strip() == pay_row['name']:
                             try:
-                                cursor.execute("SELECT email FROM notification_emails")
-                                notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
+                                notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
                                 admin_full_name = st.session_state.get('admin_full_name', 'Unknown')
                                 deleted_details = f"""
 <b>Payment Detail Deleted</b><br><br>
@@ -239,13 +257,14 @@ def admin_tab(menu="Sponsorship Items"):
 <br><b>Modified By:</b> {admin_full_name}
 """
                                 cursor.execute("DELETE FROM payment_details WHERE id=%s", (pay_id,))
-                                conn.commit()
                                 if notification_emails:
-                                    send_email(
+                                    enqueue_email(
+                                        cursor,
                                         "Ganesh Chaturthi Payment Detail Deleted",
                                         deleted_details,
                                         notification_emails
                                     )
+                                commit_and_invalidate(conn, "payment_details")
                                 st.success("🗑️ Payment detail deleted!")
                                 st.rerun()
                             except Exception as e:
@@ -259,7 +278,7 @@ def admin_tab(menu="Sponsorship Items"):
 
     if menu == "Sponsorship Items":
         st.markdown("<h2 style='color: #6A1B9A;'>Sponsorship Items</h2>", unsafe_allow_html=True)
-        df = pd.read_sql("SELECT * FROM sponsorship_items ORDER BY id", conn)
+        df = cached_read_sql(conn, "SELECT * FROM sponsorship_items ORDER BY id", ("sponsorship_items",))
         df.columns = [c.lower() for c in df.columns]
         tabs = ["Add Sponsorship Item", "Sponsorship Items List", "Edit Sponsorship Item", "Delete Sponsorship Item"]
         tab_add, tab_list, tab_edit, tab_delete = st.tabs(tabs)
@@ -278,7 +297,7 @@ def admin_tab(menu="Sponsorship Items"):
                         else:
                             cursor.execute("INSERT INTO sponsorship_items (item, amount, sponsor_limit) VALUES (%s, %s, %s)",
                                            (new_name, new_amt, new_lim))
-                        conn.commit()
+                        commit_and_invalidate(conn, "sponsorship_items")
                         st.success("✅ New item added!")
                     except Exception as e:
                         conn.rollback()
@@ -304,7 +323,7 @@ def admin_tab(menu="Sponsorship Items"):
                 try:
                     cursor.execute("UPDATE sponsorship_items SET item=%s WHERE id=%s",
                                    (new_item_name, item_row["id"]))
-                    conn.commit()
+                    commit_and_invalidate(conn, "sponsorship_items")
                     st.success("✅ Item updated successfully!")
                 except Exception as e:
                     conn.rollback()
@@ -321,7 +340,7 @@ def admin_tab(menu="Sponsorship Items"):
             if st.button("Delete Item"):
                 try:
                     cursor.execute("DELETE FROM sponsorship_items WHERE id=%s", (item_row["id"],))
-                    conn.commit()
+                    commit_and_invalidate(conn, "sponsorship_items")
                     st.success("🗑️ Sponsorship item deleted!")
                 except Exception as e:
                     conn.rollback()
@@ -332,40 +351,18 @@ def admin_tab(menu="Sponsorship Items"):
         df_sponsors = pd.read_sql("SELECT * FROM sponsors ORDER BY id", conn)
         df_sponsors.columns = [c.lower() for c in df_sponsors.columns]
         if not df_sponsors.empty:
-            # Add Type column
-            display_df = df_sponsors.copy()
-            def get_type(row):
-                if row['sponsorship'] and str(row['sponsorship']).strip():
-                    return 'Sponsorship'
-                elif row['donation'] and float(row['donation']) > 0:
-                    return 'Donation'
-                else:
-                    return ''
-            display_df['Type'] = display_df.apply(get_type, axis=1)
-            # Pre-fetch sponsorship item amounts into a dict
-            cursor.execute("SELECT item, amount, sponsor_limit FROM sponsorship_items")
-            item_amounts = {}
-            for row in cursor.fetchall():
-                item, amount, sponsor_limit = row
-                try:
-                    per_sponsor = float(amount) / int(sponsor_limit) if sponsor_limit else float(amount)
-                except Exception:
-                    per_sponsor = float(amount)
-                item_amounts[item] = per_sponsor
-            # Compute a single amount column
-            def get_amount(row):
-                if row['Type'] == 'Sponsorship':
-                    item = row['sponsorship']
-                    return item_amounts.get(item, 0.0) if item else 0.0
-                elif row['Type'] == 'Donation':
-                    try:
-                        return float(row['donation']) if row['donation'] not in (None, '', 0, '0') else 0.0
-                    except:
-                        return 0.0
-                return 0.0
-            display_df['Donation/Sponsorship Amount'] = display_df.apply(get_amount, axis=1)
-            # Remove original 'sponsorship', 'donation', and 'id' columns
-            display_df = display_df.drop(columns=['sponsorship', 'donation', 'id'])
+            # Type and amount per record, priced by the sponsor_contributions view
+            display_df = cached_read_sql(conn, """
+                SELECT name, email, mobile, apartment, gothram,
+                       CASE WHEN sponsorship IS NOT NULL AND TRIM(sponsorship) <> '' THEN 'Sponsorship'
+                            WHEN donation > 0 THEN 'Donation' ELSE '' END AS contribution_type,
+                       CASE WHEN sponsorship IS NOT NULL AND TRIM(sponsorship) <> '' THEN slot_amount
+                            WHEN donation > 0 THEN donation ELSE 0 END AS contribution_amount
+                FROM sponsor_contributions
+                ORDER BY sponsor_id
+            """, ("sponsors", "sponsorship_items"))
+            display_df = display_df.rename(columns={"contribution_type": "Type", "contribution_amount": "Donation/Sponsorship Amount"})
+            display_df["Donation/Sponsorship Amount"] = display_df["Donation/Sponsorship Amount"].astype(float)
             # Reorder columns
             col_order = ['name', 'email', 'mobile', 'apartment', 'gothram', 'Type', 'Donation/Sponsorship Amount']
             display_df = display_df[[c for c in col_order if c in display_df.columns]]
@@ -396,8 +393,7 @@ def admin_tab(menu="Sponsorship Items"):
                 st.write(f"Name: {sponsor_row['name']}")
                 st.write(f"Apartment Number: {sponsor_row['apartment']}")
                 # Editable Sponsorship Item field
-                cursor.execute("SELECT item FROM sponsorship_items ORDER BY id")
-                sponsorship_items_list = [row[0] for row in cursor.fetchall()]
+                sponsorship_items_list = [row[0] for row in cached_fetchall(conn, "SELECT item FROM sponsorship_items ORDER BY id", ("sponsorship_items",))]
                 current_item = sponsor_row['sponsorship'] if sponsor_row['sponsorship'] else ''
                 edit_sponsorship_item = st.selectbox(
                     "Sponsorship Item (editable)",
@@ -442,14 +438,12 @@ def admin_tab(menu="Sponsorship Items"):
                                 "UPDATE sponsors SET email=%s, mobile=%s, gothram=%s, sponsorship=%s, donation=%s WHERE id=%s",
                                 (edit_email, phone_fmt.strip(), edit_gothram, sponsorship_value, edit_donation, sponsor_id)
                             )
-                            conn.commit()
-                            st.success("✅ Sponsorship record updated!")
                             # Send only to notification_emails
-                            cursor.execute("SELECT email FROM notification_emails")
-                            notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
+                            notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
                             admin_full_name = st.session_state.get('admin_full_name', 'Unknown')
                             if notification_emails:
-                                send_email(
+                                enqueue_email(
+                                    cursor,
                                     "Ganesh Chaturthi Sponsorship Record Updated",
                                     f"""
     <b>Sponsorship Record Updated</b><br><br>
@@ -466,6 +460,8 @@ def admin_tab(menu="Sponsorship Items"):
     """,
                                     notification_emails
                                 )
+                            commit_and_invalidate(conn, "sponsors")
+                            st.success("✅ Sponsorship record updated!")
                         except Exception as e:
                             conn.rollback()
                             st.error(f"❌ Failed to update sponsorship: {e}")
@@ -493,8 +489,7 @@ def admin_tab(menu="Sponsorship Items"):
                     if confirm_name.strip() == sponsor_row['name']:
                         try:
                             # Fetch notification emails
-                            cursor.execute("SELECT email FROM notification_emails")
-                            notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
+                            notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
                             # Get admin full name for audit trail
                             admin_full_name = st.session_state.get('admin_full_name', 'Unknown')
                             # Prepare deleted record details with audit trail
@@ -512,15 +507,16 @@ def admin_tab(menu="Sponsorship Items"):
 <br><b>Modified By:</b> {admin_full_name}
 """
                             cursor.execute("DELETE FROM sponsors WHERE id=%s", (sponsor_id,))
-                            conn.commit()
-                            st.cache_data.clear()
-                            # Send email to notification_emails
+                            # Queue the email to notification_emails with the delete
                             if notification_emails:
-                                send_email(
+                                enqueue_email(
+                                    cursor,
                                     "Ganesh Chaturthi Sponsorship Record Deleted",
                                     deleted_details,
                                     notification_emails
                                 )
+                            commit_and_invalidate(conn, "sponsors")
+                            st.cache_data.clear()
                             st.success("🗑️ Sponsorship record deleted!")
                             st.rerun()
                         except Exception as e:
@@ -532,7 +528,7 @@ def admin_tab(menu="Sponsorship Items"):
             st.info("No sponsorship records found.")
     if menu == "Manage Notification Emails":
         st.markdown("<h2 style='color: #6A1B9A;'>✉️ Manage Notification Emails</h2>", unsafe_allow_html=True)
-        df_emails = pd.read_sql("SELECT * FROM notification_emails ORDER BY id", conn)
+        df_emails = cached_read_sql(conn, "SELECT * FROM notification_emails ORDER BY id", ("notification_emails",))
         df_emails.columns = [c.lower() for c in df_emails.columns]
         tabs = ["Add Notification Email", "Notification Emails List", "Edit Notification Email", "Delete Notification Email"]
         tab_add, tab_list, tab_edit, tab_delete = st.tabs(tabs)
@@ -544,7 +540,7 @@ def admin_tab(menu="Sponsorship Items"):
                 if st.form_submit_button("Add Email"):
                     try:
                         cursor.execute("INSERT INTO notification_emails (email) VALUES (%s)", (new_email.strip(),))
-                        conn.commit()
+                        commit_and_invalidate(conn, "notification_emails")
                         st.success("✅ Notification email added!")
                         st.rerun()
                     except Exception as e:
@@ -567,7 +563,7 @@ def admin_tab(menu="Sponsorship Items"):
             if st.button("Update Notification Email"):
                 try:
                     cursor.execute("UPDATE notification_emails SET email=%s WHERE id=%s", (edit_email_val.strip(), email_id))
-                    conn.commit()
+                    commit_and_invalidate(conn, "notification_emails")
                     st.success("✅ Notification email updated!")
                     st.rerun()
                 except Exception as e:
@@ -584,7 +580,7 @@ def admin_tab(menu="Sponsorship Items"):
             if st.button("Delete Notification Email"):
                 try:
                     cursor.execute("DELETE FROM notification_emails WHERE id=%s", (email_id,))
-                    conn.commit()
+                    commit_and_invalidate(conn, "notification_emails")
                     st.success("🗑️ Notification email deleted!")
                     st.rerun()
                 except Exception as e:
@@ -0,0 +1,32 @@
+from .db import is_snowflake
+
+# Multi-row writes for form submissions. Runs on the caller's cursor and leaves
+# commit/rollback to the caller, like enqueue_email, so a submission and its outbox message
+# still commit together.
+
+
+def insert_many(cursor, table, columns, rows):
+    # One statement for all rows; returns the new ids in row order
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        return []
+    if is_snowflake(cursor.connection):
+        # Snowflake has no RETURNING: draw the ids from <table>_id_seq first, then insert them
+        # explicitly. The connector turns executemany of an INSERT into one multi-row INSERT.
+        cursor.execute(f"SELECT {table}_id_seq.NEXTVAL FROM TABLE(GENERATOR(ROWCOUNT => {len(rows)}))")
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.executemany(
+            f"INSERT INTO {table} (id, {', '.join(columns)}) VALUES (%s, {', '.join(['%s'] * len(columns))})",
+            [(new_id,) + row for new_id, row in zip(ids, rows)]
+        )
+        return ids
+    from psycopg2.extras import execute_values
+    returned = execute_values(
+        cursor,
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s RETURNING id",
+        rows,
+        page_size=len(rows),
+        fetch=True
+    )
+    return [row[0] for row in returned]
+
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import tempfile
+
+import streamlit as st
+
+# Receipts and other uploaded files live here, keyed by the SHA-256 of their content.
+# The database only stores the key, so identical uploads share one copy.
+DEFAULT_BLOB_STORE_PATH = "data/blobs"
+
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore:
+    # Files are sharded as <root>/ab/cd/<sha256> to keep directories small
+    def __init__(self, root=DEFAULT_BLOB_STORE_PATH):
+        self.root = root
+
+    def _path(self, key):
+        if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data):
+        data = bytes(data)
+        key = content_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def get(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def size(self, key):
+        return os.path.getsize(self._path(key))
+
+    def delete(self, key):
+        # Only safe once no row references the key; content is shared between rows
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+# Backends selectable with `blob_store_backend` in secrets; each takes the configured path
+BLOB_STORE_BACKENDS = {
+    "local": LocalBlobStore,
+}
+
+
+def register_blob_store_backend(name, factory):
+    BLOB_STORE_BACKENDS[name] = factory
+
+
+def create_blob_store(backend="local", path=DEFAULT_BLOB_STORE_PATH):
+    try:
+        factory = BLOB_STORE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unsupported blob_store_backend: {backend}")
+    return factory(path)
+
+
+@st.cache_resource
+def _get_blob_store(backend, path):
+    return create_blob_store(backend, path)
+
+
+def get_blob_store():
+    return _get_blob_store(
+        st.secrets.get("blob_store_backend", "local").lower(),
+        st.secrets.get("blob_store_path", DEFAULT_BLOB_STORE_PATH),
+    )
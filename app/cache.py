@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# Upper bound on cached result sets kept across all sessions
+CACHE_MAX_ENTRIES = 256
+
+
+class TableVersionCache:
+    # Read-through cache keyed by (query, versions of the tables it reads).
+    # Writers bump a table's version after commit, so later reads miss and reload.
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._versions = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(t, 0) for t in tables)
+
+    def bump(self, *tables):
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+
+    def get_or_load(self, key, tables, loader):
+        tables = tuple(sorted(t.lower() for t in tables))
+        # Versions are read before loading: if a write lands mid-load the result
+        # is filed under the old version and never served again.
+        full_key = (key, tables, self.versions(tables))
+        with self._lock:
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                return self._entries[full_key]
+        value = loader()
+        with self._lock:
+            self._entries[full_key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@st.cache_resource
+def get_table_cache():
+    return TableVersionCache()
+
+
+def cached_fetchall(conn, sql, tables, params=None):
+    def load():
+        cursor = conn.cursor()
+        try:
+            if params is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(sql, params)
+            return [tuple(row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    rows = get_table_cache().get_or_load(("rows", sql, tuple(params or ())), tables, load)
+    return list(rows)
+
+
+def cached_read_sql(conn, sql, tables, params=None):
+    def load():
+        df = pd.read_sql(sql, conn, params=params)
+        df.columns = [c.lower() for c in df.columns]
+        return df
+    df = get_table_cache().get_or_load(("frame", sql, tuple(params or ())), tables, load)
+    return df.copy()
+
+
+def invalidate(*tables):
+    get_table_cache().bump(*(t.lower() for t in tables))
+
+
+def commit_and_invalidate(conn, *tables):
+    conn.commit()
+    invalidate(*tables)
@@ -1,12 +1,36 @@
+import threading
+import time
 
-import psycopg2
 import streamlit as st
-import snowflake.connector
+
+# ---------- Pool Settings ----------
+# Per-backend defaults; override with <prefix>_pool_max_size / <prefix>_pool_idle_timeout in secrets
+POOL_DEFAULTS = {
+    "postgres": {"max_size": 10, "idle_timeout": 300},
+    "snowflake": {"max_size": 4, "idle_timeout": 900},
+}
+POOL_SECRET_PREFIX = {"postgres": "postgres", "snowflake": "sf"}
+# Seconds to wait for a free connection before giving up
+POOL_CHECKOUT_TIMEOUT = 30
+# Connections idle longer than this are pinged before being handed out
+POOL_HEALTH_CHECK_AFTER = 30
+
+
+def get_db_type():
+    return st.secrets.get("db_type", "postgres").lower()
+
+
+def is_snowflake(conn):
+    # Snowflake connections carry an account attribute; psycopg2 ones do not
+    return hasattr(conn, "account")
+
 
 # ---------- DB Connection ----------
-def get_connection():
-    db_type = st.secrets.get("db_type", "postgres").lower()
+def _connect(db_type):
+    # Drivers are imported for the configured backend only; snowflake.connector alone
+    # adds seconds to a cold start
     if db_type == "postgres":
+        import psycopg2
         return psycopg2.connect(
             host=st.secrets["postgres_host"],
             port=st.secrets["postgres_port"],
@@ -15,6 +39,7 @@ def get_connection():
             password=st.secrets["postgres_password"]
         )
     elif db_type == "snowflake":
+        import snowflake.connector
         return snowflake.connector.connect(
             user=st.secrets["sf_user"],
             password=st.secrets["sf_password"],
@@ -27,3 +52,175 @@ def get_connection():
     else:
         raise ValueError(f"Unsupported db_type: {db_type}")
 
+
+def open_connection(db_type=None):
+    # Unpooled connection for one-off scripts; caller closes it
+    return _connect(db_type or get_db_type())
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _is_healthy(conn):
+    # psycopg2 exposes `closed` (non-zero once closed), Snowflake exposes is_closed()
+    if getattr(conn, "closed", 0):
+        return False
+    is_closed = getattr(conn, "is_closed", None)
+    if callable(is_closed) and is_closed():
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size, idle_timeout):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = []  # (conn, last_used) pairs, most recently used last
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=POOL_CHECKOUT_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            expired = self._take_expired()
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No database connection available after {timeout}s (pool size {self.max_size})")
+                self._cond.wait(remaining)
+            self._in_use += 1
+        for stale in expired:
+            _close_quietly(stale)
+        try:
+            if conn is not None and time.monotonic() - last_used > POOL_HEALTH_CHECK_AFTER and not _is_healthy(conn):
+                _close_quietly(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn):
+        # End any open transaction so the next borrower starts clean
+        healthy = not getattr(conn, "closed", 0)
+        if healthy:
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not healthy:
+            _close_quietly(conn)
+
+    def reap_idle(self):
+        with self._cond:
+            expired = self._take_expired()
+        for conn in expired:
+            _close_quietly(conn)
+        return len(expired)
+
+    def start_reaper(self, interval=60):
+        # Background sweep so idle connections are closed even when no one is checking out
+        def _loop():
+            while True:
+                time.sleep(interval)
+                self.reap_idle()
+        threading.Thread(target=_loop, name="db-pool-reaper", daemon=True).start()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {"in_use": self._in_use, "idle": len(self._idle), "max_size": self.max_size}
+
+    def _take_expired(self):
+        # Caller holds the lock; closing happens outside it since it may hit the network
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [conn for conn, last_used in self._idle if last_used < cutoff]
+        if expired:
+            self._idle = [(conn, last_used) for conn, last_used in self._idle if last_used >= cutoff]
+        return expired
+
+
+class PooledConnection:
+    # Thin proxy over a pooled DB-API connection; close() hands it back to the pool
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise AttributeError(f"Connection already returned to the pool (accessing {name!r})")
+        return getattr(conn, name)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+@st.cache_resource
+def _get_pool(db_type):
+    settings = dict(POOL_DEFAULTS[db_type])
+    prefix = POOL_SECRET_PREFIX[db_type]
+    settings["max_size"] = int(st.secrets.get(f"{prefix}_pool_max_size", settings["max_size"]))
+    settings["idle_timeout"] = int(st.secrets.get(f"{prefix}_pool_idle_timeout", settings["idle_timeout"]))
+    pool = ConnectionPool(lambda: _connect(db_type), **settings)
+    pool.start_reaper()
+    return pool
+
+
+def get_pool():
+    db_type = get_db_type()
+    if db_type not in POOL_DEFAULTS:
+        raise ValueError(f"Unsupported db_type: {db_type}")
+    return _get_pool(db_type)
+
+
+def get_connection():
+    # Shared across sessions; use as `with get_connection() as conn:` or call conn.close() when done
+    pool = get_pool()
+    return PooledConnection(pool, pool.acquire())
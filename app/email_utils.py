@@ -1,66 +1,133 @@
-def send_email_with_attachment(subject, body, recipient, attachment=None, filename=None, mime_type=None):
-    EMAIL_SENDER = st.secrets["email_sender"]
-    EMAIL_PASSWORD = st.secrets["email_password"]
-    SMTP_SERVER = st.secrets["smtp_server"]
-    SMTP_PORT = st.secrets["smtp_port"]
+import smtplib
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import streamlit as st
+
+SMTP_TIMEOUT = 30
+# Reconnect attempts per message when the server drops the session
+SMTP_MAX_RETRIES = 2
+
+
+def build_message(sender, subject, body, to=None, attachment=None, filename=None, mime_type=None):
     msg = MIMEMultipart()
-    msg['From'] = EMAIL_SENDER
-    msg['To'] = recipient
+    msg['From'] = sender
+    msg['To'] = to or sender
     msg['Subject'] = subject
     msg.attach(MIMEText(body, 'html'))
     if attachment and filename:
-        from email.mime.base import MIMEBase
-        from email import encoders
-        part = MIMEBase('application', 'octet-stream')
-        part.set_payload(attachment)
+        maintype, _, subtype = (mime_type or 'application/octet-stream').partition('/')
+        part = MIMEBase(maintype, subtype or 'octet-stream')
+        part.set_payload(attachment.encode('utf-8') if isinstance(attachment, str) else attachment)
         encoders.encode_base64(part)
         part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
-        if mime_type:
-            part.add_header('Content-Type', mime_type)
         msg.attach(part)
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, recipient, msg.as_string())
-    except Exception as e:
-        print(f"Failed to send email to {recipient}: {e}")
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import streamlit as st
-from .db import get_connection
+    return msg
 
-def send_email(subject, body, recipients):
-    if not recipients:
-        return
-    EMAIL_SENDER = st.secrets["email_sender"]
-    EMAIL_PASSWORD = st.secrets["email_password"]
-    SMTP_SERVER = st.secrets["smtp_server"]
-    SMTP_PORT = st.secrets["smtp_port"]
-    def send_with_attachment(recipient, subject, body, attachment=None, filename=None, mime_type=None):
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html'))
-        if attachment and filename:
-            from email.mime.base import MIMEBase
-            from email import encoders
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(attachment)
-            encoders.encode_base64(part)
-            part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
-            if mime_type:
-                part.add_header('Content-Type', mime_type)
-            msg.attach(part)
+
+class SMTPMailer:
+    # One authenticated SMTP session reused for a whole batch of messages.
+    # Dropped sessions are reopened transparently; results are reported per recipient
+    # as {recipient: None} on success or {recipient: "error text"} on failure.
+    def __init__(self, host, port, sender, password=None, use_tls=True, timeout=SMTP_TIMEOUT, max_retries=SMTP_MAX_RETRIES):
+        self.host = host
+        self.port = int(port)
+        self.sender = sender
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._server = None
+
+    @classmethod
+    def from_secrets(cls):
+        return cls(
+            st.secrets["smtp_server"],
+            st.secrets["smtp_port"],
+            st.secrets["email_sender"],
+            st.secrets["email_password"],
+            use_tls=st.secrets.get("smtp_use_tls", True),
+        )
+
+    def connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
         try:
-            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+            if self.use_tls:
                 server.starttls()
-                server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-                server.sendmail(EMAIL_SENDER, recipient, msg.as_string())
+            if self.password:
+                server.login(self.sender, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def close(self):
+        if self._server is not None:
+            server, self._server = self._server, None
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _sendmail(self, recipients, msg_str):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._server is None:
+                    self.connect()
+                return self._server.sendmail(self.sender, recipients, msg_str)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError):
+                # Session went away (idle timeout, network blip); reopen and retry
+                if self._server is not None:
+                    self._server.close()
+                    self._server = None
+                if attempt == self.max_retries:
+                    raise
+
+    def send(self, subject, body, recipients, attachment=None, filename=None, mime_type=None):
+        # One message per recipient, each addressed to that recipient only
+        results = {}
+        for recipient in recipients:
+            msg = build_message(self.sender, subject, body, recipient, attachment, filename, mime_type)
+            try:
+                self._sendmail([recipient], msg.as_string())
+                results[recipient] = None
+            except Exception as e:
+                results[recipient] = str(e) or type(e).__name__
+        return results
+
+    def send_bulk(self, subject, body, recipients, attachment=None, filename=None, mime_type=None):
+        # Identical content: one message, one DATA transfer, recipients only in the envelope
+        recipients = list(dict.fromkeys(recipients))
+        if not recipients:
+            return {}
+        msg = build_message(self.sender, subject, body, None, attachment, filename, mime_type)
+        try:
+            refused = self._sendmail(recipients, msg.as_string())
+        except smtplib.SMTPRecipientsRefused as e:
+            refused = e.recipients
         except Exception as e:
-            print(f"Failed to send email to {recipient}: {e}")
-    # Send to all recipients, only attach if attachment is provided (expenses)
-    for recipient in recipients:
-        send_with_attachment(recipient, subject, body)
+            return {r: str(e) or type(e).__name__ for r in recipients}
+        return {r: (str(refused[r]) if r in refused else None) for r in recipients}
+
+
+def send_email(subject, body, recipients, attachment=None, filename=None, mime_type=None):
+    if not recipients:
+        return {}
+    with SMTPMailer.from_secrets() as mailer:
+        results = mailer.send(subject, body, recipients, attachment, filename, mime_type)
+    for recipient, error in results.items():
+        if error:
+            print(f"Failed to send email to {recipient}: {error}")
+    return results
+
+
+def send_email_with_attachment(subject, body, recipient, attachment=None, filename=None, mime_type=None):
+    return send_email(subject, body, [recipient], attachment, filename, mime_type)
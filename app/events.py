@@ -19,11 +19,16 @@ st.markdown('''
 import pandas as pd
 import datetime
 from .db import get_connection
-from .email_utils import send_email
+from .cache import cached_fetchall, commit_and_invalidate
+from .outbox import enqueue_email
 
 def events_tab():
+    with get_connection() as conn:
+        _events_tab(conn)
+
+
+def _events_tab(conn):
     st.session_state['active_tab'] = 'Events'
-    conn = get_connection()
     cursor = conn.cursor()
     st.markdown("""
     <div style='text-align:center;margin-bottom:18px;'>
@@ -45,8 +50,7 @@ def events_tab():
 
     if not st.session_state.admin_logged_in:
         # User view: Active Events, Past Events
-        cursor.execute("SELECT id, title, event_date, event_time, link, description FROM events ORDER BY event_date, event_time")
-        events = cursor.fetchall()
+        events = cached_fetchall(conn, "SELECT id, title, event_date, event_time, link, description FROM events ORDER BY event_date, event_time", ("events",))
         if events:
             df_events = pd.DataFrame(events, columns=["ID", "Event Name", "Date", "Time", "Link", "Description"])
             display_df = df_events.drop(columns=["ID", "Link"])
@@ -113,13 +117,7 @@ def events_tab():
 
     if st.session_state.get('admin_logged_in', False):
         # Admin view: Add Event, Active Events, Past Events, Edit/Delete Event
-        if "events" not in st.session_state or st.session_state.get("refresh_events", True):
-            cursor.execute("SELECT id, title, event_date, event_time, link, description FROM events ORDER BY event_date, event_time")
-            events = cursor.fetchall()
-            st.session_state.events = events
-            st.session_state.refresh_events = False
-        else:
-            events = st.session_state.events
+        events = cached_fetchall(conn, "SELECT id, title, event_date, event_time, link, description FROM events ORDER BY event_date, event_time", ("events",))
 
         df_events = pd.DataFrame(events, columns=["ID", "Event Name", "Date", "Time", "Link", "Description"]) if events else pd.DataFrame(columns=["ID", "Event Name", "Date", "Time", "Link", "Description"])
         display_df = df_events.drop(columns=["ID", "Link"]) if not df_events.empty else pd.DataFrame()
@@ -164,11 +162,8 @@ def events_tab():
                                     "INSERT INTO events (title, event_date, event_time, link, description) VALUES (%s, %s, %s, %s, %s)",
                                     (new_title, new_date, new_time, None, new_description)
                                 )
-                            conn.commit()
-                            st.success("✅ Event added successfully!")
                             admin_full_name = st.session_state.get('admin_full_name', 'Unknown')
-                            cursor.execute("SELECT email FROM notification_emails")
-                            notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
+                            notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
                             html_table = f"""
                             <table border='1' cellpadding='6' cellspacing='0' style='border-collapse:collapse;'>
                               <tr><th>Title</th><td>{new_title}</td></tr>
@@ -179,12 +174,14 @@ def events_tab():
                             <br><b>Modified By:</b> {admin_full_name}
                             """
                             if notification_emails:
-                                send_email(
+                                enqueue_email(
+                                    cursor,
                                     "New Ganesh Chaturthi Event Added",
                                     f"<b>New Event Added:</b><br><br>{html_table}",
                                     notification_emails
                                 )
-                            st.session_state.refresh_events = True
+                            commit_and_invalidate(conn, "events")
+                            st.success("✅ Event added successfully!")
                             st.rerun()
                         except Exception as e:
                             conn.rollback()
@@ -272,11 +269,8 @@ def events_tab():
                                         "UPDATE events SET title=%s, event_date=%s, event_time=%s, link=%s, description=%s WHERE id=%s",
                                         (edited_title, edited_date, edited_time, None, edited_description, selected_event_id)
                                     )
-                                    conn.commit()
-                                    st.success("✅ Event updated successfully!")
                                     admin_full_name = st.session_state.get('admin_full_name', 'Unknown')
-                                    cursor.execute("SELECT email FROM notification_emails")
-                                    notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
+                                    notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
                                     html_table = f"""
                                     <table border='1' cellpadding='6' cellspacing='0' style='border-collapse:collapse;'>
                                       <tr><th>Title</th><td>{edited_title}</td></tr>
@@ -287,12 +281,14 @@ def events_tab():
                                     <br><b>Modified By:</b> {admin_full_name}
                                     """
                                     if notification_emails:
-                                        send_email(
+                                        enqueue_email(
+                                            cursor,
                                             "Ganesh Chaturthi Event Updated",
                                             f"<b>Event Updated:</b><br><br>{html_table}",
                                             notification_emails
                                         )
-                                    st.session_state.refresh_events = True
+                                    commit_and_invalidate(conn, "events")
+                                    st.success("✅ Event updated successfully!")
                                     st.rerun()
                                 except Exception as e:
                                     conn.rollback()
@@ -307,11 +303,8 @@ def events_tab():
                         if st.button("Delete Event", key="delete_event_bottom"):
                             try:
                                 cursor.execute("DELETE FROM events WHERE id=%s", (selected_event_id,))
-                                conn.commit()
-                                st.success("🗑️ Event deleted successfully!")
                                 admin_full_name = st.session_state.get('admin_full_name', 'Unknown')
-                                cursor.execute("SELECT email FROM notification_emails")
-                                notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
+                                notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
                                 html_table = f"""
                                 <table border='1' cellpadding='6' cellspacing='0' style='border-collapse:collapse;'>
                                   <tr><th>Title</th><td>{event_row['Event Name']}</td></tr>
@@ -321,12 +314,14 @@ def events_tab():
                                 <br><b>Modified By:</b> {admin_full_name}
                                 """
                                 if notification_emails:
-                                    send_email(
+                                    enqueue_email(
+                                        cursor,
                                         "Ganesh Chaturthi Event Deleted",
                                         f"<b>Event deleted:</b><br><br>{html_table}",
                                         notification_emails
                                     )
-                                st.session_state.refresh_events = True
+                                commit_and_invalidate(conn, "events")
+                                st.success("🗑️ Event deleted successfully!")
                                 st.rerun()
                             except Exception as e:
                                 conn.rollback()
@@ -2,10 +2,20 @@ import streamlit as st
 import pandas as pd
 import datetime
 from .db import get_connection
+from .cache import cached_fetchall, commit_and_invalidate
+from .outbox import enqueue_email
+from .blob_store import get_blob_store
+from .receipts import format_size, image_mime_type, ingest_receipt, load_receipt, load_thumbnail, receipt_mime_type, store_thumbnail
 import io
 
 
 def expenses_tab():
+    with get_connection() as conn:
+        page = _expenses_tab(conn)
+    _expense_sections(**page)
+
+
+def _expenses_tab(conn):
     # --- Clear Add Expense form fields if needed ---
     if st.session_state.get("clear_expense_form", False):
         st.session_state["add_expense_category"] = ""
@@ -17,7 +27,6 @@ def expenses_tab():
     # File uploader cannot be cleared programmatically; do not show info to user
         st.session_state["clear_expense_form"] = False
         st.rerun()
-    conn = get_connection()
     cursor = conn.cursor()
     # Calculate wallet and expenses totals
     cursor.execute("SELECT COALESCE(SUM(amount),0) FROM payment_details")
@@ -28,9 +37,10 @@ def expenses_tab():
     blink_color = 'red' if wallet_amount < 500 else 'green'
 
     # Fetch expenses data
-    cursor.execute("SELECT id, category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_blob FROM expenses WHERE status='active' ORDER BY category, sub_category")
+    # Metadata only; receipt bytes are loaded per expense when viewed or downloaded
+    cursor.execute("SELECT id, category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_sha256, receipt_size, receipt_thumb_sha256, CASE WHEN receipt_sha256 IS NULL THEN 0 ELSE 1 END FROM expenses WHERE status='active' ORDER BY category, sub_category")
     rows = cursor.fetchall()
-    columns = ["ID", "Category", "Sub Category", "Amount", "Date", "Spent By", "Comments", "Receipt", "Receipt Blob"]
+    columns = ["ID", "Category", "Sub Category", "Amount", "Date", "Spent By", "Comments", "Receipt", "Receipt Key", "Receipt Size", "Thumbnail Key", "Has Receipt"]
     df = pd.DataFrame(rows, columns=columns)
     def format_comments(comments):
         if not comments:
@@ -40,7 +50,24 @@ def expenses_tab():
         lines = re.split(r'[\n|]+', comments)
         return lines
     df["Comments"] = df["Comments"].apply(format_comments)
+    return {
+        "df": df,
+        "wallet_amount": wallet_amount,
+        "total_payments": total_payments,
+        "total_expenses": total_expenses,
+    }
+
+
+@st.fragment
+def _expense_sections(df, wallet_amount, total_payments, total_expenses):
+    # Switching sections and filtering rerun only this part. Totals and the expense list
+    # come from the last full run; writes below end in st.rerun(), which refreshes them.
+    with get_connection() as conn:
+        _render_expense_sections(conn, df, wallet_amount, total_payments, total_expenses)
 
+
+def _render_expense_sections(conn, df, wallet_amount, total_payments, total_expenses):
+    cursor = conn.cursor()
     # Tabs for Expenses List, Receipts, and Expense Summary
     # Determine tabs to show based on user role
     is_admin = st.session_state.get("admin_logged_in", False)
@@ -104,7 +131,7 @@ def expenses_tab():
                 st.session_state["settlement_submission_in_progress"] = True
                 st.info("Adding settlement is in progress...")
                 cursor.execute("INSERT INTO settlements (name, amount, sent_by, comments) VALUES (%s, %s, %s, %s)", (name, amount, sent_by, comments))
-                conn.commit()
+                commit_and_invalidate(conn, "settlements")
                 st.session_state["settlement_submission_in_progress"] = False
                 st.success("✅ Settlement added!")
                 # Clear form fields
@@ -184,8 +211,7 @@ def expenses_tab():
             st.dataframe(summary_df, use_container_width=True)
 
     if is_admin and selected_section == "Add Expense":
-            cursor.execute("SELECT item FROM sponsorship_items")
-            categories = [row[0] for row in cursor.fetchall()]
+            categories = [row[0] for row in cached_fetchall(conn, "SELECT item FROM sponsorship_items", ("sponsorship_items",))]
             if "Miscellaneous" not in categories:
                 categories.append("Miscellaneous")
             MAX_RECEIPT_SIZE_MB = 10
@@ -222,14 +248,23 @@ def expenses_tab():
                 elif uploaded_receipt is not None and (uploaded_receipt.size > 10 * 1024 * 1024 or uploaded_receipt.type not in ["image/jpeg", "image/png"]):
                     st.error("Invalid receipt file. Only JPG/PNG under 10MB allowed.")
                 else:
+                    receipt_key = receipt_size = receipt_original_size = thumb_key = None
+                    if receipt_bytes:
+                        # Oriented, metadata-free, size-capped copy is what gets stored and emailed
+                        try:
+                            receipt_bytes, receipt_path, receipt_original_size = ingest_receipt(receipt_bytes, receipt_path)
+                        except ValueError as e:
+                            st.error(str(e))
+                            st.stop()
+                        receipt_key = get_blob_store().put(receipt_bytes)
+                        receipt_size = len(receipt_bytes)
+                        thumb_key = store_thumbnail(receipt_bytes)
                     if hasattr(cursor, 'execute') and hasattr(cursor.connection, 'account'):  # crude check for Snowflake
-                        cursor.execute("INSERT INTO expenses (id, category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_blob, status) VALUES (expenses_id_seq.NEXTVAL, %s, %s, %s, %s, %s, %s, %s, %s, 'active')", (category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_bytes))
+                        cursor.execute("INSERT INTO expenses (id, category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_sha256, receipt_size, receipt_original_size, receipt_thumb_sha256, status) VALUES (expenses_id_seq.NEXTVAL, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'active')", (category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_key, receipt_size, receipt_original_size, thumb_key))
                     else:
-                        cursor.execute("INSERT INTO expenses (category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_blob, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'active')", (category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_bytes))
-                    conn.commit()
+                        cursor.execute("INSERT INTO expenses (category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_sha256, receipt_size, receipt_original_size, receipt_thumb_sha256, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'active')", (category, sub_category, amount, date, spent_by, comments, receipt_path, receipt_key, receipt_size, receipt_original_size, thumb_key))
                     # Fetch notification email recipients
-                    cursor.execute("SELECT email FROM notification_emails")
-                    recipients = [row[0] for row in cursor.fetchall()]
+                    recipients = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",))]
                     # Prepare email subject and body
                     subject = f"New Expense Added: {category} - {sub_category}"
                     with open("app/html/expense/expense_added_table.html", "r") as f:
@@ -245,18 +280,17 @@ def expenses_tab():
                     # Add Submitted by info after the table
                     admin_full_name = st.session_state.get("admin_full_name", "Admin")
                     body += f"<div style='margin-top:18px;font-size:1.08em;'><b>Submitted by:</b> <span style='color:#1976D2;'>{admin_full_name}</span></div>"
-                    # Send email with receipt attached if present
+                    # Queue the email (receipt attached if present) in the same transaction as the insert
                     st.session_state["expense_submission_in_progress"] = True
                     st.info("Add expense record is in progress...")
-                    from app.email_utils import send_email, send_email_with_attachment
                     if receipt_bytes:
                         mime_type = "image/jpeg" if receipt_path.lower().endswith((".jpg", ".jpeg")) else "image/png"
-                        for recipient in recipients:
-                            send_email_with_attachment(subject, body, recipient, receipt_bytes, receipt_path, mime_type)
+                        enqueue_email(cursor, subject, body, recipients, receipt_bytes, receipt_path, mime_type)
                     else:
-                        send_email(subject, body, recipients)
+                        enqueue_email(cursor, subject, body, recipients)
+                    commit_and_invalidate(conn, "expenses")
                     st.session_state["expense_submission_in_progress"] = False
-                    st.success("✅ Expense added and notification email sent!")
+                    st.success("✅ Expense added and notification email queued!")
                     # Set flag to clear input fields on next run
                     st.session_state["clear_expense_form"] = True
                     st.rerun()
@@ -276,7 +310,7 @@ def expenses_tab():
             if selected_spent_by != "All":
                 filtered_df = filtered_df[filtered_df["Spent By"] == selected_spent_by]
 
-        drop_cols = ["Receipt Blob", "Receipt"]
+        drop_cols = ["Receipt Key", "Receipt Size", "Thumbnail Key", "Has Receipt", "Receipt"]
         if not is_admin and "Spent By" in filtered_df.columns:
             drop_cols.append("Spent By")
         show_df = filtered_df.drop(drop_cols, axis=1)
@@ -315,22 +349,42 @@ def expenses_tab():
         receipts_df = df.sort_values(by="ID")
         for idx, row in receipts_df.iterrows():
             receipt_name = row["Receipt"]
-            receipt_blob = row["Receipt Blob"]
+            receipt_key = row["Receipt Key"]
             is_admin = st.session_state.get("admin_logged_in", False)
-            if isinstance(receipt_name, str) and receipt_name.strip() and receipt_blob:
-                data = receipt_blob
-                if isinstance(data, memoryview):
-                    data = data.tobytes()
-                elif isinstance(data, bytearray):
-                    data = bytes(data)
+            if row["Has Receipt"] and isinstance(receipt_name, str) and receipt_name.strip():
                 label_text = f"View Receipt: ID {row['ID']} | Amount {row['Amount']} | Date {row['Date']}"
                 if is_admin and "Spent By" in row:
                     label_text += f" | Spent By {row['Spent By']}"
+                if pd.notna(row["Receipt Size"]):
+                    label_text += f" | {format_size(int(row['Receipt Size']))}"
+                open_key = f"receipt_open_{row['ID']}"
                 if st.button(label_text, key=f"view_receipt_{row['ID']}"):
+                    st.session_state[open_key] = not st.session_state.get(open_key, False)
+                if st.session_state.get(open_key):
                     import base64
-                    img_type = "jpeg" if receipt_name.lower().endswith((".jpg", ".jpeg")) else "png"
+                    # Show the small preview; the original is only read for an explicit download
+                    thumb_key = row["Thumbnail Key"]
+                    data = load_thumbnail(thumb_key) if isinstance(thumb_key, str) and thumb_key else None
+                    if data is None:
+                        data = load_receipt(row["ID"], receipt_key)
+                    if data is None:
+                        st.warning("Receipt file missing")
+                        continue
+                    img_type = image_mime_type(data)
                     img_base64 = base64.b64encode(data).decode("utf-8")
-                    st.markdown(f"<div style='margin-bottom:18px;'><img src='data:image/{img_type};base64,{img_base64}' style='max-width:320px;max-height:320px;border-radius:12px;border:2px solid #eee;box-shadow:0 2px 8px #ccc;margin-top:8px;'/></div>", unsafe_allow_html=True)
+                    st.markdown(f"<div style='margin-bottom:18px;'><img src='data:{img_type};base64,{img_base64}' style='max-width:320px;max-height:320px;border-radius:12px;border:2px solid #eee;box-shadow:0 2px 8px #ccc;margin-top:8px;'/></div>", unsafe_allow_html=True)
+                    if st.button("Get Original", key=f"get_original_{row['ID']}"):
+                        original = load_receipt(row["ID"], receipt_key)
+                        if original is None:
+                            st.warning("Receipt file missing")
+                        else:
+                            st.download_button(
+                                label="Download Original Receipt",
+                                data=original,
+                                file_name=receipt_name,
+                                mime=receipt_mime_type(receipt_name),
+                                key=f"download_original_{row['ID']}"
+                            )
             else:
                 label_text = f"No Receipt for ID {row['ID']} | Amount {row['Amount']} | Date {row['Date']}"
                 if is_admin and "Spent By" in row:
@@ -350,10 +404,9 @@ def expenses_tab():
                 st.info("No expense summary available yet.")
     # Edit/Delete Expense Section (admin only)
     if is_admin and selected_section == "Edit/Delete Expense":
-            if rows:
+            if not df.empty:
                 categories = []
-                cursor.execute("SELECT item FROM sponsorship_items")
-                categories = [row[0] for row in cursor.fetchall()]
+                categories = [row[0] for row in cached_fetchall(conn, "SELECT item FROM sponsorship_items", ("sponsorship_items",))]
                 if "Miscellaneous" not in categories:
                     categories.append("Miscellaneous")
                 # Sort by ID
@@ -393,27 +446,31 @@ def expenses_tab():
                         plain_comments = plain_comments.strip()
                         new_comments = st.text_area("Comments", value=plain_comments)
                         receipt_name = entry["Receipt"]
-                        receipt_blob = entry["Receipt Blob"]
+                        receipt_key = entry["Receipt Key"]
                         receipt_deleted = False
                         new_receipt_bytes = None
                         new_receipt_path = None
-                        if isinstance(receipt_name, str) and receipt_name.strip() and receipt_blob:
+                        if entry["Has Receipt"] and isinstance(receipt_name, str) and receipt_name.strip():
                             st.markdown("<b>Current Receipt:</b>", unsafe_allow_html=True)
-                            data = receipt_blob
-                            if isinstance(data, memoryview):
-                                data = data.tobytes()
-                            elif isinstance(data, bytearray):
-                                data = bytes(data)
-                            st.download_button(
-                                label="Download Receipt",
-                                data=data,
-                                file_name=receipt_name,
-                                mime="image/jpeg" if receipt_name.lower().endswith((".jpg", ".jpeg")) else "image/png",
-                                key=f"edit_download_{selected_id}"
-                            )
+                            # Bytes are only fetched once the admin asks for them
+                            loaded_key = f"edit_receipt_loaded_{selected_id}"
+                            if st.session_state.get(loaded_key) or st.button("Load Receipt", key=f"load_receipt_{selected_id}"):
+                                st.session_state[loaded_key] = True
+                                receipt_data = load_receipt(selected_id, receipt_key)
+                                if receipt_data is None:
+                                    st.warning("Receipt file missing")
+                                else:
+                                    st.download_button(
+                                        label="Download Receipt",
+                                        data=receipt_data,
+                                        file_name=receipt_name,
+                                        mime=receipt_mime_type(receipt_name),
+                                        key=f"edit_download_{selected_id}"
+                                    )
                             if st.button("Delete Receipt", key=f"delete_receipt_{selected_id}"):
-                                cursor.execute("UPDATE expenses SET receipt_path=NULL, receipt_blob=NULL WHERE id=%s", (selected_id,))
-                                conn.commit()
+                                cursor.execute("UPDATE expenses SET receipt_path=NULL, receipt_sha256=NULL, receipt_size=NULL, receipt_original_size=NULL, receipt_thumb_sha256=NULL WHERE id=%s", (selected_id,))
+                                commit_and_invalidate(conn, "expenses")
+                                st.session_state.pop(f"edit_receipt_loaded_{selected_id}", None)
                                 st.success("Receipt deleted. You can upload a new one below.")
                                 receipt_deleted = True
                                 st.rerun()
@@ -421,6 +478,7 @@ def expenses_tab():
                             st.info("No receipt uploaded yet. You can upload one below.")
                         # Ensure MAX_RECEIPT_SIZE_MB is defined
                         MAX_RECEIPT_SIZE_MB = 10
+                        MAX_RECEIPT_SIZE_BYTES = MAX_RECEIPT_SIZE_MB * 1024 * 1024
                         uploaded_new_receipt = st.file_uploader(f"Upload New Receipt (JPG/PNG, max {MAX_RECEIPT_SIZE_MB}MB)", type=["jpg", "jpeg", "png"], key=f"edit_upload_receipt_{selected_id}")
                         if uploaded_new_receipt is not None:
                             if uploaded_new_receipt.size > MAX_RECEIPT_SIZE_BYTES:
@@ -434,10 +492,16 @@ def expenses_tab():
                                 new_receipt_bytes = uploaded_new_receipt.read()
                         if st.button("Update Expense"):
                             if new_receipt_bytes and new_receipt_path:
-                                cursor.execute("UPDATE expenses SET category=%s, sub_category=%s, amount=%s, date=%s, spent_by=%s, comments=%s, receipt_path=%s, receipt_blob=%s, status='active' WHERE id=%s", (new_category, new_sub_category, new_amount, new_date, new_spent_by, new_comments, new_receipt_path, new_receipt_bytes, selected_id))
+                                try:
+                                    new_receipt_bytes, new_receipt_path, new_original_size = ingest_receipt(new_receipt_bytes, new_receipt_path)
+                                except ValueError as e:
+                                    st.error(str(e))
+                                    st.stop()
+                                new_receipt_key = get_blob_store().put(new_receipt_bytes)
+                                new_thumb_key = store_thumbnail(new_receipt_bytes)
+                                cursor.execute("UPDATE expenses SET category=%s, sub_category=%s, amount=%s, date=%s, spent_by=%s, comments=%s, receipt_path=%s, receipt_sha256=%s, receipt_size=%s, receipt_original_size=%s, receipt_thumb_sha256=%s, status='active' WHERE id=%s", (new_category, new_sub_category, new_amount, new_date, new_spent_by, new_comments, new_receipt_path, new_receipt_key, len(new_receipt_bytes), new_original_size, new_thumb_key, selected_id))
                             else:
                                 cursor.execute("UPDATE expenses SET category=%s, sub_category=%s, amount=%s, date=%s, spent_by=%s, comments=%s, status='active' WHERE id=%s", (new_category, new_sub_category, new_amount, new_date, new_spent_by, new_comments, selected_id))
-                            conn.commit()
                             subject = f"Expense Edited: {new_category} - {new_sub_category}"
                             with open("app/html/expense/edit_expense_notification.html", "r") as f:
                                 html_template = f.read()
@@ -462,12 +526,11 @@ def expenses_tab():
                             recipients = [st.secrets.get("admin_email", "")]
                             if new_receipt_bytes and new_receipt_path:
                                 mime_type = "image/jpeg" if new_receipt_path.lower().endswith((".jpg", ".jpeg")) else "image/png"
-                                from app.email_utils import send_email_with_attachment
-                                send_email_with_attachment(subject, body, recipients[0], new_receipt_bytes, new_receipt_path, mime_type)
+                                enqueue_email(cursor, subject, body, recipients, new_receipt_bytes, new_receipt_path, mime_type)
                             else:
-                                from app.email_utils import send_email
-                                send_email(subject, body, recipients)
-                            st.success("✅ Updated and notification email sent!")
+                                enqueue_email(cursor, subject, body, recipients)
+                            commit_and_invalidate(conn, "expenses")
+                            st.success("✅ Updated and notification email queued!")
                             st.rerun()
                     with delete_tab:
                         entered_cat = st.text_input(f"Type the Category to confirm deletion ({entry['Category']})", key=f"delete_cat_{selected_id}")
@@ -478,7 +541,6 @@ def expenses_tab():
                         if st.button("Delete Expense", key=f"delete_expense_{selected_id}"):
                             if entered_cat.strip() == entry['Category'].strip() and entered_subcat.strip() == entry['Sub Category'].strip():
                                 cursor.execute("UPDATE expenses SET status='inactive' WHERE id=%s", (selected_id,))
-                                conn.commit()
                                 subject = f"Expense Deleted: {entry['Category']} - {entry['Sub Category']}"
                                 with open("app/html/expense/delete_expense_confirm.html", "r") as f:
                                     html_template = f.read()
@@ -500,11 +562,10 @@ def expenses_tab():
                                     spent_by=entry['Spent By'],
                                     comments=entry['Comments']
                                 )
-                                cursor.execute("SELECT email FROM notification_emails")
-                                recipients = [row[0] for row in cursor.fetchall()]
-                                from app.email_utils import send_email
-                                send_email(subject, body, recipients)
-                                st.success("🗑️ Deleted and notification email sent!")
+                                recipients = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",))]
+                                enqueue_email(cursor, subject, body, recipients)
+                                commit_and_invalidate(conn, "expenses")
+                                st.success("🗑️ Deleted and notification email queued!")
                                 st.rerun()
                             else:
                                 st.warning(f"Please type the exact Category '{entry['Category']}' and Sub Category '{entry['Sub Category']}' to confirm deletion.")
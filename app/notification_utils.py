@@ -1,9 +1,7 @@
-from .db import get_connection
+from .cache import cached_fetchall
 
-def get_notification_emails():
-    conn = get_connection()
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT email FROM notification_emails")
-        emails = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return emails
+def get_notification_emails(conn):
+    # Takes the caller's connection: a second checkout while the caller holds one (often with
+    # an open write) can exhaust the pool
+    rows = cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",))
+    return [row[0] for row in rows]
@@ -0,0 +1,27 @@
+import json
+
+from .db import is_snowflake
+
+# Messages are written here by the app and delivered by outbox_worker.py
+OUTBOX_TABLE = "email_outbox"
+
+
+def enqueue_email(cursor, subject, body, recipients, attachment=None, filename=None, mime_type=None):
+    # Runs on the caller's cursor so the message commits (or rolls back) with the data change
+    recipients = list(dict.fromkeys(r.strip() for r in recipients if r and r.strip()))
+    if not recipients:
+        return False
+    params = (subject, body, json.dumps(recipients), attachment, filename, mime_type)
+    if is_snowflake(cursor.connection):
+        cursor.execute(
+            "INSERT INTO email_outbox (id, subject, body, recipients, attachment, attachment_name, attachment_mime, status) "
+            "VALUES (email_outbox_id_seq.NEXTVAL, %s, %s, %s, %s, %s, %s, 'pending')",
+            params
+        )
+    else:
+        cursor.execute(
+            "INSERT INTO email_outbox (subject, body, recipients, attachment, attachment_name, attachment_mime, status) "
+            "VALUES (%s, %s, %s, %s, %s, %s, 'pending')",
+            params
+        )
+    return True
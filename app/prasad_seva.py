@@ -3,17 +3,93 @@ import pandas as pd
 import datetime
 import pytz
 from datetime import datetime as dt, time as dttime
-from .db import get_connection
-from .email_utils import send_email
+from .db import get_connection, is_snowflake
+from .cache import cached_fetchall, commit_and_invalidate
+from .outbox import enqueue_email
+from .batch import insert_many
+from .reports import XLSX_MIME, Report
+import csv
+import io
+
+SPONSORS_LIST_OPTION = "Prasad Seva Sponsors List"
+# Sponsors List: rows per page on screen, and rows per round trip when exporting
+SPONSORS_PAGE_SIZE = 50
+SPONSORS_EXPORT_BATCH = 1000
+SPONSORS_COLUMNS = ["ID", "Type", "Names", "Item Name", "How many people are you bringing item for", "Apartemnt Number", "Date", "Pooja Time"]
+# List order; the keyset cursor is the last row's values of these expressions
+SPONSORS_SORT_KEY = ["seva_date", "CASE WHEN pooja_time='Morning Pooja' THEN 0 ELSE 1 END", "COALESCE(names, '')", "id"]
+# Add Prasad Seva writes one row per item (see insert_many)
+PRASAD_SEVA_INSERT_COLUMNS = ("seva_type", "names", "item_name", "num_people", "apartment", "seva_date", "pooja_time", "created_by", "status")
+
+def _badge(values):
+    return "<span style='background-color:#FFECB3;color:#6D4C41;padding:4px 12px;border-radius:16px;font-weight:bold;display:inline-block;text-align:center;'>" + values.astype(str) + "</span>"
+
+
+def _build_summary(conn):
+    # People served per day and pooja, with empty slots of the festival shown as 0
+    rows = cached_fetchall(conn, "SELECT seva_date, pooja_time, SUM(num_people) FROM prasad_seva WHERE status='active' GROUP BY seva_date, pooja_time", ("prasad_seva",))
+    metrics_df = pd.DataFrame(rows, columns=["Date", "Pooja Time", "Total People Served"])
+    metrics_df["Date"] = pd.to_datetime(metrics_df["Date"]).dt.date
+    all_dates = pd.date_range(datetime.date(2025, 8, 26), datetime.date(2025, 8, 30)).date
+    grid = pd.DataFrame([(d, p) for d in all_dates for p in ["Morning Pooja", "Evening Pooja"]], columns=["Date", "Pooja Time"])
+    df = grid.merge(metrics_df, on=["Date", "Pooja Time"], how="left").fillna({"Total People Served": 0})
+    df["Total People Served"] = df["Total People Served"].astype(int)
+    # No morning pooja on the first day
+    df = df[~((df["Date"] == datetime.date(2025, 8, 26)) & (df["Pooja Time"] == "Morning Pooja"))]
+    df["Pooja Time"] = df["Pooja Time"].str.replace(" Pooja", "", regex=False)
+    return df.reset_index(drop=True)
+
+
+def _build_served_by_name(conn):
+    rows = cached_fetchall(conn, "SELECT names, SUM(num_people) as total_served FROM prasad_seva WHERE status='active' GROUP BY names ORDER BY total_served DESC", ("prasad_seva",))
+    df = pd.DataFrame(rows, columns=["Name/Group", "Total Served"])
+    df["Total Served"] = df["Total Served"].astype(int)
+    return df
+
+
+SUMMARY_REPORT = Report(
+    "prasad_seva_summary",
+    ("prasad_seva",),
+    _build_summary,
+    html_formatters={
+        "Date": lambda s: "<span style='font-size:16px;'>&#128197;</span> <b>" + pd.to_datetime(s).dt.strftime('%d-%b-%Y') + "</b>",
+        "Pooja Time": lambda s: "<span style='font-size:18px;'>" + s.map({"Morning": "🌅", "Evening": "🌇"}) + "</span> <b>" + s + "</b>",
+        "Total People Served": _badge,
+    },
+    sheet_name="Prasad Seva Summary",
+)
+
+SERVED_BY_NAME_REPORT = Report(
+    "prasad_seva_served_by_name",
+    ("prasad_seva",),
+    _build_served_by_name,
+    html_formatters={
+        "Name/Group": lambda s: ("<span style='font-size:16px;'>&#128100;</span> <b>" + s.fillna("") + "</b>").where(s.fillna("") != "", ""),
+        "Total Served": _badge,
+    },
+    sheet_name="Total Served by Name",
+)
+
+
+def _report_downloads(conn, report, file_name, key_suffix):
+    col_csv, col_xlsx = st.columns(2)
+    col_csv.download_button(label="📥", data=report.csv(conn), file_name=f"{file_name}.csv", mime="text/csv", key=f"download_{key_suffix}_csv")
+    col_xlsx.download_button(label="📥 XLSX", data=report.xlsx(conn), file_name=f"{file_name}.xlsx", mime=XLSX_MIME, key=f"download_{key_suffix}_xlsx")
+
 
 def prasad_seva_tab():
+    with get_connection() as conn:
+        selected_tab = _prasad_seva_tab(conn)
+    # The Sponsors List fragment opens its own connection, so it runs once the tab's
+    # connection is back in the pool rather than nested inside it
+    if selected_tab == SPONSORS_LIST_OPTION:
+        _sponsors_list_section()
+        st.markdown("---")
+
+
+def _prasad_seva_tab(conn):
     laddu_winners_option = "Laddu Auction Winners"
-    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT laddu_number, winner_name, amount FROM laddu_winners ORDER BY laddu_number ASC LIMIT 3")
-    laddu_winners = [
-        {"laddu": row[0], "name": row[1], "amount": row[2]} for row in cursor.fetchall()
-    ]
     is_admin = st.session_state.get("admin_logged_in", False)
     # Define tab_names for admin/non-admin
     if is_admin:
@@ -21,13 +97,13 @@ def prasad_seva_tab():
             "Add Prasad Seva",
             "Edit/Delete Prasad Seva Entry",
             "Prasad Seva Summary",
-            "Prasad Seva Sponsors List",
+            SPONSORS_LIST_OPTION,
             "Total Served by Name/Group"
         ]
     else:
         tab_names = [
             "Prasad Seva Summary",
-            "Prasad Seva Sponsors List",
+            SPONSORS_LIST_OPTION,
             "Total Served by Name/Group"
         ]
     # Prepend Laddu Auction Winners as default option
@@ -35,6 +111,9 @@ def prasad_seva_tab():
     selected_tab = st.selectbox("Select Section", tab_names, index=0)
 
     if selected_tab == laddu_winners_option:
+        laddu_winners = [
+            {"laddu": row[0], "name": row[1], "amount": row[2]} for row in cached_fetchall(conn, "SELECT laddu_number, winner_name, amount FROM laddu_winners ORDER BY laddu_number ASC LIMIT 3", ("laddu_winners",))
+        ]
         st.markdown(
             """
             <div style='max-width:520px;margin:0 auto 18px auto;background:#FFFDE7;border-radius:18px;box-shadow:0 2px 12px #FFD18033;padding:28px 18px;'>
@@ -138,18 +217,19 @@ def prasad_seva_tab():
                 st.error("Pooja Time is required.")
             else:
                 st.info("Add Prasad Seva is in progress...")
-                for item in item_names:
-                    if hasattr(cursor, 'execute') and hasattr(cursor.connection, 'account'):
-                        cursor.execute(
-                            "INSERT INTO prasad_seva (id, seva_type, names, item_name, num_people, apartment, seva_date, pooja_time, created_by, status) VALUES (prasad_seva_id_seq.NEXTVAL, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                            (seva_type, ', '.join(names), item, num_people, apartment, seva_date, pooja_time, st.session_state.get('admin_full_name', 'User'), 'active')
-                        )
-                    else:
-                        cursor.execute(
-                            "INSERT INTO prasad_seva (seva_type, names, item_name, num_people, apartment, seva_date, pooja_time, created_by, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                            (seva_type, ', '.join(names), item, num_people, apartment, seva_date, pooja_time, st.session_state.get('admin_full_name', 'User'), 'active')
-                        )
-                conn.commit()
+                created_by = st.session_state.get('admin_full_name', 'User')
+                rows = [
+                    (seva_type, ', '.join(names), item, num_people, apartment, seva_date, pooja_time, created_by, 'active')
+                    for item in item_names
+                ]
+                # All items of a submission go in together or not at all
+                try:
+                    insert_many(cursor, "prasad_seva", PRASAD_SEVA_INSERT_COLUMNS, rows)
+                    commit_and_invalidate(conn, "prasad_seva")
+                except Exception as e:
+                    conn.rollback()
+                    st.error(f"❌ Add Prasad Seva failed: {e}")
+                    st.stop()
                 submitted_info = {
                     "Type": seva_type,
                     "Names": ', '.join(names),
@@ -165,120 +245,20 @@ def prasad_seva_tab():
                 st.rerun()
 
     elif selected_tab == "Prasad Seva Summary":
-        cursor.execute("SELECT seva_date, pooja_time, SUM(num_people) FROM prasad_seva WHERE status='active' GROUP BY seva_date, pooja_time")
-        metrics_rows = cursor.fetchall()
-        min_date = datetime.date(2025, 8, 26)
-        max_date = datetime.date(2025, 8, 30)
-        all_dates = pd.date_range(min_date, max_date).date
-        pooja_times = ["Morning Pooja", "Evening Pooja"]
-        grid = pd.DataFrame([(d, p) for d in all_dates for p in pooja_times], columns=["Date", "Pooja Time"])
-        metrics_df = pd.DataFrame(metrics_rows, columns=["Date", "Pooja Time", "Total People Served"])
-        metrics_df["Date"] = pd.to_datetime(metrics_df["Date"]).dt.date
-        merged_df = grid.merge(metrics_df, on=["Date", "Pooja Time"], how="left").fillna({"Total People Served": 0})
-        merged_df["Total People Served"] = merged_df["Total People Served"].astype(int)
-        merged_df = merged_df[~((merged_df["Date"] == datetime.date(2025, 8, 26)) & (merged_df["Pooja Time"] == "Morning Pooja"))]
-        merged_df["Date"] = merged_df["Date"].apply(lambda d: f"<span style='font-size:16px;'>&#128197;</span> <b>{pd.to_datetime(d).strftime('%d-%b-%Y')}</b>")
-        merged_df["Pooja Time"] = merged_df["Pooja Time"].apply(lambda t: f"<span style='font-size:18px;'>{'🌅' if t=='Morning Pooja' else '🌇'}</span> <b>{t.replace('Pooja','')}</b>")
-        merged_df["Total People Served"] = merged_df["Total People Served"].apply(lambda x: f"<span style='background-color:#FFECB3;color:#6D4C41;padding:4px 12px;border-radius:16px;font-weight:bold;display:inline-block;text-align:center;'>{x}</span>")
-        cursor.execute("SELECT SUM(num_people) FROM prasad_seva WHERE status='active'")
-        total_sponsored = cursor.fetchone()[0] or 0
+        total_sponsored = cached_fetchall(conn, "SELECT SUM(num_people) FROM prasad_seva WHERE status='active'", ("prasad_seva",))[0][0] or 0
         st.markdown(f"<h4 style='text-align:center;color:#388E3C;background:#C8E6C9;padding:7px;border-radius:10px;margin-bottom:0.5em;font-size:1.1em;'>🎉 Total People Served Count (All Days): <span style='color:#1B5E20;'>{total_sponsored}</span></h4>", unsafe_allow_html=True)
-        st.markdown(merged_df.to_html(escape=False, index=False, justify='center'), unsafe_allow_html=True)
-        raw_metrics_df = merged_df.copy()
-        raw_metrics_df["Date"] = pd.to_datetime(raw_metrics_df["Date"].str.extract(r'<b>(.*?)</b>')[0], format='%d-%b-%Y')
-        raw_metrics_df["Pooja Time"] = raw_metrics_df["Pooja Time"].str.extract(r'<b>(.*?)</b>')[0]
-        raw_metrics_df["Total People Served"] = raw_metrics_df["Total People Served"].str.extract(r'>(\d+)<')[0].fillna(0).astype(int)
-        csv_summary = raw_metrics_df.to_csv(index=False)
-        st.download_button(label="📥", data=csv_summary, file_name="prasad_seva_summary.csv", mime="text/csv", key="download_summary_tab1")
-
-    elif selected_tab == "Prasad Seva Sponsors List":
-        min_date = datetime.date(2025, 8, 26)
-        max_date = datetime.date(2025, 8, 30)
-        filter_col1, filter_col2, filter_col3 = st.columns(3)
-        filter_date = filter_col1.date_input("Filter by Date", value=None, min_value=min_date, max_value=max_date, key="prasad_filter_date_tab2")
-        filter_name = filter_col2.text_input("Filter by Name", value="", key="prasad_filter_name_tab2")
-        pooja_time_options = ["All", "Morning Pooja", "Evening Pooja"]
-        filter_pooja_time = filter_col3.selectbox("Filter by Pooja Time", pooja_time_options, key="prasad_filter_pooja_time_tab2")
-        query = "SELECT id, seva_type, names, item_name, num_people, apartment, seva_date, pooja_time, created_by, status FROM prasad_seva WHERE status='active'"
-        filters = []
-        params = []
-        if filter_date:
-            filters.append("seva_date = %s")
-            params.append(filter_date)
-        if filter_name:
-            filters.append("names ILIKE %s")
-            params.append(f"%{filter_name}%")
-        if filter_pooja_time != "All":
-            filters.append("pooja_time = %s")
-            params.append(filter_pooja_time)
-        if filters:
-            query += " AND " + " AND ".join(filters)
-        query += " ORDER BY seva_date, CASE WHEN pooja_time='Morning Pooja' THEN 0 ELSE 1 END, names, id"
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
-        if rows and len(rows) > 0:
-            df = pd.DataFrame(rows, columns=["ID", "Type", "Names", "Item Name", "How many people are you bringing item for", "Apartemnt Number", "Date", "Pooja Time", "Created By", "Status"])
-            if "Status" in df.columns:
-                df = df.drop(columns=["Status"])
-            # Split into active and past based on CST date
-            cst = pytz.timezone('US/Central')
-            now_cst = dt.now(cst)
-            today_cst = now_cst.date()
-            df_active = df[pd.to_datetime(df["Date"]).dt.date >= today_cst]
-            df_past = df[pd.to_datetime(df["Date"]).dt.date < today_cst]
-            tab1, tab2 = st.tabs(["Active", "Past"])
-            for tab, df_tab, label in [(tab1, df_active, "Active"), (tab2, df_past, "Past")]:
-                with tab:
-                    if len(df_tab) > 0:
-                        df_display = df_tab.drop(columns=["ID", "Created By"])
-                        df_display["Date"] = df_display["Date"].apply(lambda d: f"<span style='font-size:16px;'>&#128197;</span> <b>{pd.to_datetime(d).strftime('%d-%b-%Y')}</b>")
-                        def pooja_time_display(row):
-                            if row["Date"].startswith("<span") and "26-Aug-2025" in row["Date"] and row["Pooja Time"].find("Morning") != -1:
-                                return ""
-                            return f"<span style='font-size:18px;'>{'🌅' if row['Pooja Time']=='Morning Pooja' else '🌇'}</span> <b>{row['Pooja Time'].replace('Pooja','')}</b>"
-                        df_display["Pooja Time"] = df_display.apply(pooja_time_display, axis=1)
-                        df_display["Type"] = df_display["Type"].apply(lambda t: f"<span style='background-color:{'#B2DFDB' if t=='Group' else '#FFCCBC'};color:#4E342E;padding:4px 10px;border-radius:12px;font-weight:bold;'>{'👥 Group' if t=='Group' else '🧑 Individual'}</span>")
-                        df_display["Apartemnt Number"] = df_display["Apartemnt Number"].apply(lambda apt: f"<span style='font-size:16px;'>&#127968;</span> <b>{apt}</b>" if apt else "")
-                        df_display["Names"] = df_display["Names"].apply(lambda n: f"<span style='font-size:16px;'>&#128100;</span> <b>{n}</b>" if n else "")
-                        df_display["Item Name"] = df_display["Item Name"].apply(lambda item: f"<span style='font-size:16px;'>&#127858;</span> <b>{item}</b>" if item else "")
-                        df_display["How many people are you bringing item for"] = df_display["How many people are you bringing item for"].apply(lambda x: f"<span style='background-color:#FFECB3;color:#6D4C41;padding:4px 12px;border-radius:16px;font-weight:bold;display:inline-block;text-align:center;'>{x}</span>")
-                        # Sort by Date, Pooja Time (morning before evening), then Name
-                        df_display["_date_sort"] = pd.to_datetime(df_tab["Date"])
-                        df_display["_pooja_sort"] = df_tab["Pooja Time"].apply(lambda x: 0 if str(x).lower().find("morning") != -1 else 1)
-                        df_display = df_display.sort_values(by=["_date_sort", "_pooja_sort", "Names"])
-                        df_display = df_display.drop(columns=["_date_sort", "_pooja_sort"])
-                        df_display.index = range(1, len(df_display) + 1)
-                        st.markdown(df_display.to_html(escape=False, index=True, justify='center'), unsafe_allow_html=True)
-                        raw_sponsors_df = df_tab.drop(columns=["ID", "Created By"])
-                        csv_sponsors = raw_sponsors_df.to_csv(index=False)
-                        st.download_button(label="📥", data=csv_sponsors, file_name=f"prasad_seva_sponsors_list_{label.lower()}.csv", mime="text/csv", key=f"download_sponsors_tab_{label.lower()}")
-                        if st.session_state.get('admin_logged_in', False):
-                            if st.button(f"Send Prasad Seva Details to Email ({label})"):
-                                cursor.execute("SELECT email FROM notification_emails")
-                                notification_emails = [row[0] for row in cursor.fetchall() if row[0]]
-                                html_table = df_tab.drop(columns=["ID", "Created By"]).to_html(index=False, border=1, justify='center')
-                                send_email(
-                                    f"Prasad Seva Sponsors List ({label})",
-                                    f"<b>Current Prasad Seva List ({label})</b><br><br>{html_table}",
-                                    notification_emails
-                                )
-                                st.success("✅ Email sent!")
-                    else:
-                        st.info(f"No {label} Prasad Seva entries yet.")
-        else:
-            st.info("No Prasad Seva entries yet.")
+        st.markdown(SUMMARY_REPORT.html(conn), unsafe_allow_html=True)
+        _report_downloads(conn, SUMMARY_REPORT, "prasad_seva_summary", "tab1")
+
+    elif selected_tab == SPONSORS_LIST_OPTION:
+        # Rendered by prasad_seva_tab after this connection is released
+        return selected_tab
 
     elif selected_tab == "Total Served by Name/Group":
         st.markdown("<h5 style='margin-bottom:0.2em;'>🧑👥 Total Served by Name/Group</h5>", unsafe_allow_html=True)
-        cursor.execute("SELECT names, SUM(num_people) as total_served FROM prasad_seva WHERE status='active' GROUP BY names ORDER BY total_served DESC")
-        name_rows = cursor.fetchall()
-        if name_rows and len(name_rows) > 0:
-            name_df = pd.DataFrame(name_rows, columns=["Name/Group", "Total Served"])
-            name_df["Name/Group"] = name_df["Name/Group"].apply(lambda n: f"<span style='font-size:16px;'>&#128100;</span> <b>{n}</b>" if n else "")
-            name_df["Total Served"] = name_df["Total Served"].apply(lambda x: f"<span style='background-color:#FFECB3;color:#6D4C41;padding:4px 12px;border-radius:16px;font-weight:bold;display:inline-block;text-align:center;'>{x}</span>")
-            st.markdown(name_df.to_html(escape=False, index=False, justify='center'), unsafe_allow_html=True)
-            csv_name = name_df[['Name/Group', 'Total Served']].to_csv(index=False)
-            st.download_button(label="📥", data=csv_name, file_name="prasad_seva_total_served_by_name.csv", mime="text/csv", key="download_total_served_tab2")
+        if not SERVED_BY_NAME_REPORT.frame(conn).empty:
+            st.markdown(SERVED_BY_NAME_REPORT.html(conn), unsafe_allow_html=True)
+            _report_downloads(conn, SERVED_BY_NAME_REPORT, "prasad_seva_total_served_by_name", "tab2")
         else:
             st.info("No Prasad Seva entries yet.")
 
@@ -345,7 +325,7 @@ def prasad_seva_tab():
                             "UPDATE prasad_seva SET seva_type=%s, names=%s, item_name=%s, num_people=%s, apartment=%s, seva_date=%s, pooja_time=%s, status=%s WHERE id=%s",
                             (entry["Type"], entry["Names"], new_item, new_num, entry["Apartemnt Number"], new_date, new_pooja_time, 'active', selected_id)
                         )
-                        conn.commit()
+                        commit_and_invalidate(conn, "prasad_seva")
                         st.success("✅ Updated!")
                         st.rerun()
                 elif action == "Delete":
@@ -355,7 +335,7 @@ def prasad_seva_tab():
                     if st.button("Delete Prasad Seva", key=f"delete_prasad_{selected_id}"):
                         if entered_name.strip() == entry['Names']:
                             cursor.execute("UPDATE prasad_seva SET status='inactive' WHERE id=%s", (selected_id,))
-                            conn.commit()
+                            commit_and_invalidate(conn, "prasad_seva")
                             st.success("🗑️ Deleted!")
                             st.rerun()
                         else:
@@ -364,3 +344,183 @@ def prasad_seva_tab():
             st.info("No Prasad Seva entries available to edit or delete.")
 
     st.markdown("---")
+
+
+@st.fragment
+def _sponsors_list_section():
+    # Filter changes rerun only this section, on its own pooled connection
+    with get_connection() as conn:
+        _sponsors_list(conn)
+
+
+def _sponsors_filter(filter_date, filter_name, filter_pooja_time):
+    filters = ["status='active'"]
+    params = []
+    if filter_date:
+        filters.append("seva_date = %s")
+        params.append(filter_date)
+    if filter_name:
+        filters.append("names ILIKE %s")
+        params.append(f"%{filter_name}%")
+    if filter_pooja_time != "All":
+        filters.append("pooja_time = %s")
+        params.append(filter_pooja_time)
+    return " AND ".join(filters), params
+
+
+def _sort_key(row):
+    # Values of SPONSORS_SORT_KEY for a fetched row; the next page starts after them
+    return (row[6], 0 if row[7] == "Morning Pooja" else 1, row[2] or "", row[0])
+
+
+def _fetch_sponsors_page(cursor, where, params, after, limit):
+    # Keyset page: rows strictly after the `after` sort key, in list order
+    params = list(params)
+    if after is not None:
+        if is_snowflake(cursor.connection):
+            # No row-value comparison on Snowflake: (a, b, c, d) > (w, x, y, z) spelled out,
+            # behind a plain bound on the leading column for partition pruning
+            condition = f"{SPONSORS_SORT_KEY[-1]} > %s"
+            condition_params = [after[-1]]
+            for expr, value in reversed(list(zip(SPONSORS_SORT_KEY[:-1], after[:-1]))):
+                condition = f"({expr} > %s OR ({expr} = %s AND {condition}))"
+                condition_params = [value, value] + condition_params
+            condition = f"{SPONSORS_SORT_KEY[0]} >= %s AND {condition}"
+            condition_params = [after[0]] + condition_params
+        else:
+            # A row-value comparison over the index expressions is an index range start on
+            # prasad_seva_sponsors_list_idx; the OR-expanded form is not
+            condition = f"({', '.join(SPONSORS_SORT_KEY)}) > ({', '.join(['%s'] * len(after))})"
+            condition_params = list(after)
+        where = f"{where} AND {condition}"
+        params += condition_params
+    cursor.execute(
+        f"SELECT id, seva_type, names, item_name, num_people, apartment, seva_date, pooja_time FROM prasad_seva "
+        f"WHERE {where} ORDER BY {', '.join(SPONSORS_SORT_KEY)} LIMIT {int(limit)}",
+        tuple(params)
+    )
+    return cursor.fetchall()
+
+
+def _iter_sponsors(cursor, where, params, batch_size=SPONSORS_EXPORT_BATCH):
+    # Whole filtered list in keyset batches, so exports never hold one giant result set
+    after = None
+    while True:
+        rows = _fetch_sponsors_page(cursor, where, params, after, batch_size)
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        after = _sort_key(rows[-1])
+
+
+def _sponsors_csv(cursor, where, params):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(SPONSORS_COLUMNS[1:])
+    for rows in _iter_sponsors(cursor, where, params):
+        writer.writerows(row[1:] for row in rows)
+    return out.getvalue()
+
+
+def _sponsors_pages(label, signature):
+    # Start keys of the pages visited so far; the last one is the page on screen.
+    # New filters (or a new day moving entries from Active to Past) start again at page 1.
+    state_key = f"prasad_sponsors_pages_{label.lower()}"
+    state = st.session_state.get(state_key)
+    if state is None or state["signature"] != signature:
+        state = {"signature": signature, "starts": [None]}
+        st.session_state[state_key] = state
+    return state
+
+
+def _sponsors_list(conn):
+    cursor = conn.cursor()
+    min_date = datetime.date(2025, 8, 26)
+    max_date = datetime.date(2025, 8, 30)
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    filter_date = filter_col1.date_input("Filter by Date", value=None, min_value=min_date, max_value=max_date, key="prasad_filter_date_tab2")
+    filter_name = filter_col2.text_input("Filter by Name", value="", key="prasad_filter_name_tab2")
+    pooja_time_options = ["All", "Morning Pooja", "Evening Pooja"]
+    filter_pooja_time = filter_col3.selectbox("Filter by Pooja Time", pooja_time_options, key="prasad_filter_pooja_time_tab2")
+    where, params = _sponsors_filter(filter_date, filter_name, filter_pooja_time)
+    # Active/Past is decided by the CST date, passed in so both backends agree on "today"
+    today_cst = dt.now(pytz.timezone('US/Central')).date()
+    cursor.execute(
+        "SELECT COALESCE(SUM(CASE WHEN seva_date >= %s THEN 1 ELSE 0 END), 0), "
+        f"COALESCE(SUM(CASE WHEN seva_date < %s THEN 1 ELSE 0 END), 0) FROM prasad_seva WHERE {where}",
+        tuple([today_cst, today_cst] + params)
+    )
+    active_count, past_count = cursor.fetchone()
+    if not active_count and not past_count:
+        st.info("No Prasad Seva entries yet.")
+        return
+    signature = (filter_date, filter_name, filter_pooja_time, today_cst)
+    tab1, tab2 = st.tabs([f"Active ({active_count})", f"Past ({past_count})"])
+    for tab, label, split, count in [(tab1, "Active", "seva_date >= %s", active_count), (tab2, "Past", "seva_date < %s", past_count)]:
+        with tab:
+            if not count:
+                st.info(f"No {label} Prasad Seva entries yet.")
+                continue
+            tab_where = f"{where} AND {split}"
+            tab_params = params + [today_cst]
+            pages = _sponsors_pages(label, signature)
+            page_index = len(pages["starts"]) - 1
+            # One extra row tells whether there is a next page
+            rows = _fetch_sponsors_page(cursor, tab_where, tab_params, pages["starts"][-1], SPONSORS_PAGE_SIZE + 1)
+            if not rows and page_index:
+                # Entries on this page were removed meanwhile; go back to the first page
+                del pages["starts"][1:]
+                page_index = 0
+                rows = _fetch_sponsors_page(cursor, tab_where, tab_params, None, SPONSORS_PAGE_SIZE + 1)
+            if not rows:
+                # Everything counted above was removed before the page was read
+                st.info(f"No {label} Prasad Seva entries yet.")
+                continue
+            has_next = len(rows) > SPONSORS_PAGE_SIZE
+            rows = rows[:SPONSORS_PAGE_SIZE]
+            df_display = pd.DataFrame(rows, columns=SPONSORS_COLUMNS).drop(columns=["ID"])
+            df_display["Date"] = df_display["Date"].apply(lambda d: f"<span style='font-size:16px;'>&#128197;</span> <b>{pd.to_datetime(d).strftime('%d-%b-%Y')}</b>")
+            def pooja_time_display(row):
+                if row["Date"].startswith("<span") and "26-Aug-2025" in row["Date"] and row["Pooja Time"].find("Morning") != -1:
+                    return ""
+                return f"<span style='font-size:18px;'>{'🌅' if row['Pooja Time']=='Morning Pooja' else '🌇'}</span> <b>{row['Pooja Time'].replace('Pooja','')}</b>"
+            df_display["Pooja Time"] = df_display.apply(pooja_time_display, axis=1)
+            df_display["Type"] = df_display["Type"].apply(lambda t: f"<span style='background-color:{'#B2DFDB' if t=='Group' else '#FFCCBC'};color:#4E342E;padding:4px 10px;border-radius:12px;font-weight:bold;'>{'👥 Group' if t=='Group' else '🧑 Individual'}</span>")
+            df_display["Apartemnt Number"] = df_display["Apartemnt Number"].apply(lambda apt: f"<span style='font-size:16px;'>&#127968;</span> <b>{apt}</b>" if apt else "")
+            df_display["Names"] = df_display["Names"].apply(lambda n: f"<span style='font-size:16px;'>&#128100;</span> <b>{n}</b>" if n else "")
+            df_display["Item Name"] = df_display["Item Name"].apply(lambda item: f"<span style='font-size:16px;'>&#127858;</span> <b>{item}</b>" if item else "")
+            df_display["How many people are you bringing item for"] = df_display["How many people are you bringing item for"].apply(lambda x: f"<span style='background-color:#FFECB3;color:#6D4C41;padding:4px 12px;border-radius:16px;font-weight:bold;display:inline-block;text-align:center;'>{x}</span>")
+            # Rows arrive in list order (date, morning before evening, name); number them across pages
+            first = page_index * SPONSORS_PAGE_SIZE + 1
+            df_display.index = range(first, first + len(df_display))
+            st.markdown(df_display.to_html(escape=False, index=True, justify='center'), unsafe_allow_html=True)
+            prev_col, info_col, next_col = st.columns([1, 2, 1])
+            prev_col.button("◀ Previous", key=f"sponsors_prev_{label.lower()}", disabled=page_index == 0,
+                            on_click=lambda starts=pages["starts"]: starts.pop())
+            info_col.markdown(f"<div style='text-align:center;'>Showing {first}-{first + len(rows) - 1} of {count}</div>", unsafe_allow_html=True)
+            next_col.button("Next ▶", key=f"sponsors_next_{label.lower()}", disabled=not has_next,
+                            on_click=lambda starts=pages["starts"], key=_sort_key(rows[-1]): starts.append(key))
+            # The export walks the whole filtered list in keyset batches, only when asked for
+            csv_key = f"prasad_sponsors_csv_{label.lower()}"
+            if st.button("📥 Prepare CSV", key=f"prepare_sponsors_csv_{label.lower()}"):
+                st.session_state[csv_key] = (signature, _sponsors_csv(cursor, tab_where, tab_params))
+            prepared = st.session_state.get(csv_key)
+            if prepared and prepared[0] == signature:
+                st.download_button(label="📥", data=prepared[1], file_name=f"prasad_seva_sponsors_list_{label.lower()}.csv", mime="text/csv", key=f"download_sponsors_tab_{label.lower()}")
+            if st.session_state.get('admin_logged_in', False):
+                if st.button(f"Send Prasad Seva Details to Email ({label})"):
+                    notification_emails = [row[0] for row in cached_fetchall(conn, "SELECT email FROM notification_emails", ("notification_emails",)) if row[0]]
+                    df_email = pd.DataFrame(
+                        [row[1:] for rows in _iter_sponsors(cursor, tab_where, tab_params) for row in rows],
+                        columns=SPONSORS_COLUMNS[1:]
+                    )
+                    html_table = df_email.to_html(index=False, border=1, justify='center')
+                    enqueue_email(
+                        cursor,
+                        f"Prasad Seva Sponsors List ({label})",
+                        f"<b>Current Prasad Seva List ({label})</b><br><br>{html_table}",
+                        notification_emails
+                    )
+                    conn.commit()
+                    st.success("✅ Email queued!")
@@ -0,0 +1,170 @@
+import io
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from .blob_store import get_blob_store
+
+# Receipt bytes kept in memory across sessions; lists only ever hold metadata
+RECEIPT_CACHE_MAX_ENTRIES = 8
+RECEIPT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Gallery previews: longest side in pixels and encoder quality
+THUMBNAIL_MAX_SIZE = 320
+THUMBNAIL_QUALITY = 70
+# Uploaded receipts are normalized to at most this many pixels on the longest side and
+# re-encoded as JPEG; override with receipt_max_dimension / receipt_jpeg_quality in secrets
+RECEIPT_MAX_DIMENSION = 2000
+RECEIPT_JPEG_QUALITY = 80
+
+
+class ReceiptCache:
+    # LRU keyed by expense ID. Each entry remembers the content key it was loaded for,
+    # so a replaced receipt is reloaded instead of served stale.
+    def __init__(self, max_entries=RECEIPT_CACHE_MAX_ENTRIES, max_bytes=RECEIPT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, expense_id, receipt_key, loader):
+        with self._lock:
+            entry = self._entries.get(expense_id)
+            if entry is not None and entry[0] == receipt_key:
+                self._entries.move_to_end(expense_id)
+                return entry[1]
+        data = loader(receipt_key)
+        with self._lock:
+            old = self._entries.pop(expense_id, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[expense_id] = (receipt_key, data)
+            self._bytes += len(data)
+            # Always keep the entry just loaded, even if it alone exceeds the byte budget
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return data
+
+    def discard(self, expense_id):
+        with self._lock:
+            old = self._entries.pop(expense_id, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+
+
+@st.cache_resource
+def get_receipt_cache():
+    return ReceiptCache()
+
+
+def load_receipt(expense_id, receipt_key):
+    # None when the stored file is gone (the local blob directory is not backed up)
+    try:
+        return get_receipt_cache().get(expense_id, receipt_key, lambda key: get_blob_store().get(key))
+    except FileNotFoundError:
+        return None
+
+
+def receipt_mime_type(receipt_name):
+    return "image/jpeg" if receipt_name.lower().endswith((".jpg", ".jpeg")) else "image/png"
+
+
+def format_size(num_bytes):
+    if not num_bytes:
+        return ""
+    if num_bytes < 1024 * 1024:
+        return f"{num_bytes / 1024:.0f} KB"
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+
+def make_thumbnail(data, max_size=THUMBNAIL_MAX_SIZE, quality=THUMBNAIL_QUALITY):
+    # WebP where Pillow was built with it, JPEG otherwise; returns None for unreadable images
+    from PIL import Image, ImageOps, features
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_size, max_size))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            if features.check("webp"):
+                img.save(out, format="WEBP", quality=quality, method=4)
+            else:
+                img.save(out, format="JPEG", quality=quality, optimize=True)
+            return out.getvalue()
+    except Exception:
+        return None
+
+
+def store_thumbnail(data):
+    # Content key of the stored preview, or None if no preview could be made
+    thumb = make_thumbnail(data)
+    return get_blob_store().put(thumb) if thumb else None
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _load_thumbnail(thumb_key):
+    # Previews are a few KB and immutable per key, so they are cheap to keep around
+    return get_blob_store().get(thumb_key)
+
+
+def load_thumbnail(thumb_key):
+    # None when the file is gone; a missing file is not cached, so a restored one shows up
+    try:
+        return _load_thumbnail(thumb_key)
+    except FileNotFoundError:
+        return None
+
+
+def image_mime_type(data):
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    return "image/jpeg"
+
+
+def normalize_receipt(data, max_dimension=RECEIPT_MAX_DIMENSION, quality=RECEIPT_JPEG_QUALITY):
+    # Applies EXIF orientation, drops metadata, caps the resolution and re-encodes as JPEG.
+    # Returns None when the bytes are not a readable image.
+    from PIL import Image, ImageOps
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            has_metadata = bool(img.info.get("exif") or img.getexif())
+            img = ImageOps.exif_transpose(img)
+            resized = max(img.size) > max_dimension
+            if resized:
+                img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                # Flatten transparency onto white so PNG scans stay readable as JPEG
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[-1])
+                img = background
+            elif img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    except Exception:
+        return None
+    stored = out.getvalue()
+    # Re-encoding a small, clean, already-compressed file can grow it; keep the upload then
+    if len(stored) >= len(data) and not resized and not has_metadata:
+        return data
+    return stored
+
+
+def ingest_receipt(data, filename):
+    # Returns (stored bytes, stored file name, original size in bytes)
+    stored = normalize_receipt(
+        data,
+        int(st.secrets.get("receipt_max_dimension", RECEIPT_MAX_DIMENSION)),
+        int(st.secrets.get("receipt_jpeg_quality", RECEIPT_JPEG_QUALITY)),
+    )
+    if stored is None:
+        raise ValueError("Receipt is not a readable JPG/PNG image.")
+    if stored is not data:
+        filename = filename.rsplit(".", 1)[0] + ".jpg"
+    return stored, filename, len(data)
@@ -0,0 +1,57 @@
+import io
+
+from .cache import get_table_cache
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def render_html(df, formatters=None):
+    # formatters: {column: vectorized function taking the Series and returning HTML strings}
+    out = df.copy()
+    for column, formatter in (formatters or {}).items():
+        out[column] = formatter(out[column])
+    return out.to_html(escape=False, index=False, justify='center')
+
+
+def render_csv(df):
+    return df.to_csv(index=False)
+
+
+def render_xlsx(df, sheet_name="Report"):
+    import pandas as pd
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+        worksheet = writer.sheets[sheet_name[:31]]
+        for i, column in enumerate(df.columns):
+            width = max([len(str(column))] + [len(str(v)) for v in df[column].head(200)])
+            worksheet.set_column(i, i, min(width + 2, 60))
+    return buffer.getvalue()
+
+
+class Report:
+    # One summary table. `build(conn)` runs the aggregation and returns a typed DataFrame
+    # (plain values, no markup); the renderers only format it. The frame and every rendered
+    # output are cached per version of `tables`, so a write to any of them rebuilds both.
+    def __init__(self, name, tables, build, html_formatters=None, sheet_name=None):
+        self.name = name
+        self.tables = tuple(tables)
+        self.build = build
+        self.html_formatters = html_formatters or {}
+        self.sheet_name = sheet_name or name
+
+    def _cached(self, conn, kind, render):
+        return get_table_cache().get_or_load(("report", self.name, kind), self.tables, lambda: render(self.frame(conn)))
+
+    def frame(self, conn):
+        df = get_table_cache().get_or_load(("report", self.name, "frame"), self.tables, lambda: self.build(conn))
+        return df.copy()
+
+    def html(self, conn):
+        return self._cached(conn, "html", lambda df: render_html(df, self.html_formatters))
+
+    def csv(self, conn):
+        return self._cached(conn, "csv", render_csv)
+
+    def xlsx(self, conn):
+        return self._cached(conn, "xlsx", lambda df: render_xlsx(df, self.sheet_name))
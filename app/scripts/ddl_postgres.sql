@@ -1,6 +1,7 @@
 CREATE TABLE IF NOT EXISTS notification_emails (
     id SERIAL PRIMARY KEY,
-    email TEXT NOT NULL UNIQUE
+    email TEXT NOT NULL UNIQUE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 -- Postgres DDL for all tables
 
@@ -10,21 +11,24 @@ CREATE TABLE IF NOT EXISTS payment_details (
     amount NUMERIC(10,2) NOT NULL,
     date DATE NOT NULL,
     comments TEXT,
-    payment_type TEXT
+    payment_type TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS transfers (
     id SERIAL PRIMARY KEY,
     name TEXT NOT NULL,
     phone TEXT,
-    email TEXT
+    email TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS sponsorship_items (
     id SERIAL PRIMARY KEY,
     item TEXT UNIQUE NOT NULL,
     amount NUMERIC NOT NULL,
-    sponsor_limit INTEGER NOT NULL
+    sponsor_limit INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS sponsors (
@@ -35,7 +39,8 @@ CREATE TABLE IF NOT EXISTS sponsors (
     apartment TEXT NOT NULL,
     sponsorship TEXT,
     donation NUMERIC DEFAULT 0,
-    gothram STRING
+    gothram STRING,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS events (
@@ -44,7 +49,8 @@ CREATE TABLE IF NOT EXISTS events (
     event_date DATE,
     event_time TIME,
     link TEXT,
-    description TEXT
+    description TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS expenses (
@@ -56,9 +62,13 @@ CREATE TABLE IF NOT EXISTS expenses (
     spent_by TEXT NOT NULL,
     comments TEXT,
     receipt_path TEXT,
-    receipt_blob BYTEA,
+    receipt_sha256 CHAR(64),
+    receipt_thumb_sha256 CHAR(64),
+    receipt_size INTEGER,
+    receipt_original_size INTEGER,
     status VARCHAR(10) DEFAULT 'active',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS prasad_seva (
@@ -72,7 +82,8 @@ CREATE TABLE IF NOT EXISTS prasad_seva (
     pooja_time VARCHAR(20),
     created_by VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    status VARCHAR(10) DEFAULT 'active'
+    status VARCHAR(10) DEFAULT 'active',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Create table for Laddu Auction Winners in PostgreSQL
@@ -91,3 +102,140 @@ CREATE TABLE settlements (
     sent_by VARCHAR(255) NOT NULL,
     comments TEXT
 );
+
+-- Outgoing notification emails, delivered by outbox_worker.py
+-- status: pending -> sending -> sent | retry (back to sending) | dead
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id SERIAL PRIMARY KEY,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    attachment BYTEA,
+    attachment_name TEXT,
+    attachment_mime TEXT,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS email_outbox_due_idx ON email_outbox (next_attempt_at) WHERE status IN ('pending', 'retry', 'sending');
+
+-- One row per delivered daily_report digest; the next run reports what changed after it
+CREATE TABLE IF NOT EXISTS report_runs (
+    id SERIAL PRIMARY KEY,
+    report VARCHAR(50) NOT NULL,
+    run_at TIMESTAMP NOT NULL,
+    last_sponsor_id INTEGER NOT NULL DEFAULT 0,
+    last_payment_id INTEGER NOT NULL DEFAULT 0,
+    last_expense_id INTEGER NOT NULL DEFAULT 0,
+    filled_item_ids TEXT,
+    -- Ids in range that the run's snapshot could not see yet; rechecked by the next run
+    pending_sponsor_ids TEXT,
+    pending_payment_ids TEXT,
+    pending_expense_ids TEXT,
+    -- Inactive expense ids the run saw; the next run reports the ones added since
+    inactive_expense_ids TEXT
+);
+CREATE INDEX IF NOT EXISTS report_runs_report_idx ON report_runs (report, id);
+
+-- updated_at is the watermark for pg_to_snowflake_sync.py; the trigger keeps it current on every UPDATE
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notification_emails_set_updated_at ON notification_emails;
+CREATE TRIGGER notification_emails_set_updated_at BEFORE UPDATE ON notification_emails FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS notification_emails_updated_at_idx ON notification_emails (updated_at);
+
+DROP TRIGGER IF EXISTS payment_details_set_updated_at ON payment_details;
+CREATE TRIGGER payment_details_set_updated_at BEFORE UPDATE ON payment_details FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS payment_details_updated_at_idx ON payment_details (updated_at);
+
+DROP TRIGGER IF EXISTS transfers_set_updated_at ON transfers;
+CREATE TRIGGER transfers_set_updated_at BEFORE UPDATE ON transfers FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS transfers_updated_at_idx ON transfers (updated_at);
+
+DROP TRIGGER IF EXISTS sponsorship_items_set_updated_at ON sponsorship_items;
+CREATE TRIGGER sponsorship_items_set_updated_at BEFORE UPDATE ON sponsorship_items FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS sponsorship_items_updated_at_idx ON sponsorship_items (updated_at);
+
+DROP TRIGGER IF EXISTS sponsors_set_updated_at ON sponsors;
+CREATE TRIGGER sponsors_set_updated_at BEFORE UPDATE ON sponsors FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS sponsors_updated_at_idx ON sponsors (updated_at);
+
+DROP TRIGGER IF EXISTS events_set_updated_at ON events;
+CREATE TRIGGER events_set_updated_at BEFORE UPDATE ON events FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS events_updated_at_idx ON events (updated_at);
+
+DROP TRIGGER IF EXISTS expenses_set_updated_at ON expenses;
+CREATE TRIGGER expenses_set_updated_at BEFORE UPDATE ON expenses FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS expenses_updated_at_idx ON expenses (updated_at);
+
+DROP TRIGGER IF EXISTS prasad_seva_set_updated_at ON prasad_seva;
+CREATE TRIGGER prasad_seva_set_updated_at BEFORE UPDATE ON prasad_seva FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS prasad_seva_updated_at_idx ON prasad_seva (updated_at);
+
+-- Indexes for the hot filters (also shipped as migrations/005_hot_filter_indexes_postgres.sql)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Expenses list (ORDER BY category, sub_category) and summary by person
+CREATE INDEX IF NOT EXISTS expenses_active_category_idx ON expenses (category, sub_category) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS expenses_active_spent_by_idx ON expenses (spent_by) WHERE status = 'active';
+
+-- Prasad Seva lists, per-day summary and the names ILIKE filter
+CREATE INDEX IF NOT EXISTS prasad_seva_active_date_idx ON prasad_seva (seva_date, pooja_time, id) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS prasad_seva_active_names_trgm_idx ON prasad_seva USING gin (names gin_trgm_ops) WHERE status = 'active';
+-- Matches the Sponsors List keyset order, so each page is an index range scan
+CREATE INDEX IF NOT EXISTS prasad_seva_sponsors_list_idx ON prasad_seva (seva_date, (CASE WHEN pooja_time='Morning Pooja' THEN 0 ELSE 1 END), (COALESCE(names, '')), id) WHERE status = 'active';
+
+-- Slot counts join on sponsorship; payment and sponsor lookups go by name
+CREATE INDEX IF NOT EXISTS sponsors_sponsorship_idx ON sponsors (sponsorship);
+CREATE INDEX IF NOT EXISTS sponsors_name_idx ON sponsors (name);
+CREATE INDEX IF NOT EXISTS payment_details_payment_type_idx ON payment_details (payment_type);
+CREATE INDEX IF NOT EXISTS payment_details_name_idx ON payment_details (name);
+CREATE INDEX IF NOT EXISTS payment_details_date_idx ON payment_details (date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS settlements_name_idx ON settlements (name);
+CREATE INDEX IF NOT EXISTS events_date_idx ON events (event_date, event_time);
+
+-- Canonical per-slot pricing: each sponsored slot costs amount / sponsor_limit, rounded to cents.
+-- Plain views, so they always reflect the latest writes; the app caches reads per table version
+-- (see app/cache.py) and writers to sponsors/sponsorship_items invalidate those reads.
+
+-- One row per sponsorship item with its slot price and how many slots are taken
+CREATE OR REPLACE VIEW sponsorship_item_slots AS
+SELECT si.id AS item_id,
+       si.item,
+       si.amount,
+       si.sponsor_limit,
+       ROUND(CASE WHEN si.sponsor_limit > 0 THEN si.amount / si.sponsor_limit ELSE si.amount END, 2) AS slot_amount,
+       COUNT(s.id) AS filled,
+       si.sponsor_limit - COUNT(s.id) AS remaining
+FROM sponsorship_items si
+LEFT JOIN sponsors s ON s.sponsorship = si.item
+GROUP BY si.id, si.item, si.amount, si.sponsor_limit;
+
+-- One row per sponsors row with its slot amount (0 without an item) and donation
+CREATE OR REPLACE VIEW sponsor_contributions AS
+SELECT s.id AS sponsor_id,
+       s.name,
+       s.email,
+       s.mobile,
+       s.apartment,
+       s.gothram,
+       s.sponsorship,
+       CASE WHEN s.sponsorship IS NULL OR s.sponsorship = '' THEN 0
+            WHEN si.sponsor_limit > 0 THEN ROUND(si.amount / si.sponsor_limit, 2)
+            ELSE COALESCE(si.amount, 0) END AS slot_amount,
+       COALESCE(s.donation, 0) AS donation,
+       CASE WHEN s.sponsorship IS NULL OR s.sponsorship = '' THEN 0
+            WHEN si.sponsor_limit > 0 THEN ROUND(si.amount / si.sponsor_limit, 2)
+            ELSE COALESCE(si.amount, 0) END + COALESCE(s.donation, 0) AS total_amount
+FROM sponsors s
+LEFT JOIN sponsorship_items si ON si.item = s.sponsorship;
@@ -9,7 +9,8 @@ use schema ganesh_db.ganesh_schema;
 
 CREATE TABLE notification_emails (
     id INTEGER AUTOINCREMENT PRIMARY KEY,
-    email STRING NOT NULL UNIQUE
+    email STRING NOT NULL UNIQUE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE payment_details (
@@ -18,21 +19,24 @@ CREATE TABLE payment_details (
     amount NUMBER(10,2) NOT NULL,
     date DATE NOT NULL,
     comments STRING,
-    payment_type STRING
+    payment_type STRING,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE transfers (
     id INTEGER AUTOINCREMENT PRIMARY KEY,
     name STRING NOT NULL,
     phone STRING,
-    email STRING
+    email STRING,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE sponsorship_items (
     id INTEGER AUTOINCREMENT PRIMARY KEY,
     item STRING UNIQUE NOT NULL,
     amount NUMBER NOT NULL,
-    sponsor_limit INTEGER NOT NULL
+    sponsor_limit INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE sponsors (
@@ -43,7 +47,8 @@ CREATE TABLE sponsors (
     apartment STRING NOT NULL,
     sponsorship STRING,
     donation NUMBER DEFAULT 0,
-    gothram STRING
+    gothram STRING,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE events (
@@ -52,7 +57,8 @@ CREATE TABLE events (
     event_date DATE,
     event_time TIME,
     link STRING,
-    description STRING
+    description STRING,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE expenses (
@@ -64,9 +70,13 @@ CREATE TABLE expenses (
     spent_by STRING NOT NULL,
     comments STRING,
     receipt_path STRING,
-    receipt_blob BINARY,
+    receipt_sha256 STRING,
+    receipt_thumb_sha256 STRING,
+    receipt_size INTEGER,
+    receipt_original_size INTEGER,
     status STRING DEFAULT 'active',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE prasad_seva (
@@ -80,7 +90,8 @@ CREATE TABLE prasad_seva (
     pooja_time STRING,
     created_by STRING,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    status STRING DEFAULT 'active'
+    status STRING DEFAULT 'active',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Create table for Laddu Auction Winners in Snowflake
@@ -98,4 +109,84 @@ CREATE TABLE settlements (
     amount NUMBER(10,2) NOT NULL,
     sent_by STRING NOT NULL,
     comments STRING
-);
\ No newline at end of file
+);
+
+-- Outgoing notification emails, delivered by outbox_worker.py
+CREATE TABLE email_outbox (
+    id INTEGER AUTOINCREMENT PRIMARY KEY,
+    subject STRING NOT NULL,
+    body STRING NOT NULL,
+    recipients STRING NOT NULL,
+    attachment BINARY,
+    attachment_name STRING,
+    attachment_mime STRING,
+    status STRING NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error STRING,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE SEQUENCE IF NOT EXISTS email_outbox_id_seq START WITH 1 INCREMENT BY 1;
+
+-- One row per delivered daily_report digest; the next run reports what changed after it
+CREATE TABLE report_runs (
+    id INTEGER AUTOINCREMENT PRIMARY KEY,
+    report STRING NOT NULL,
+    run_at TIMESTAMP NOT NULL,
+    last_sponsor_id INTEGER NOT NULL DEFAULT 0,
+    last_payment_id INTEGER NOT NULL DEFAULT 0,
+    last_expense_id INTEGER NOT NULL DEFAULT 0,
+    filled_item_ids STRING,
+    -- Ids in range that the run's snapshot could not see yet; rechecked by the next run
+    pending_sponsor_ids STRING,
+    pending_payment_ids STRING,
+    pending_expense_ids STRING,
+    -- Inactive expense ids the run saw; the next run reports the ones added since
+    inactive_expense_ids STRING
+);
+CREATE SEQUENCE IF NOT EXISTS report_runs_id_seq START WITH 1 INCREMENT BY 1;
+
+-- Clustering keys for the hot filters (see migrations/005_hot_filter_clustering_snowflake.sql)
+ALTER TABLE expenses CLUSTER BY (status, category);
+ALTER TABLE prasad_seva CLUSTER BY (status, seva_date);
+ALTER TABLE sponsors CLUSTER BY (sponsorship);
+ALTER TABLE payment_details CLUSTER BY (payment_type, date);
+
+-- Canonical per-slot pricing: each sponsored slot costs amount / sponsor_limit, rounded to cents.
+-- Plain views, so they always reflect the latest writes; the app caches reads per table version
+-- (see app/cache.py) and writers to sponsors/sponsorship_items invalidate those reads.
+
+-- One row per sponsorship item with its slot price and how many slots are taken
+CREATE OR REPLACE VIEW sponsorship_item_slots AS
+SELECT si.id AS item_id,
+       si.item,
+       si.amount,
+       si.sponsor_limit,
+       ROUND(CASE WHEN si.sponsor_limit > 0 THEN si.amount / si.sponsor_limit ELSE si.amount END, 2) AS slot_amount,
+       COUNT(s.id) AS filled,
+       si.sponsor_limit - COUNT(s.id) AS remaining
+FROM sponsorship_items si
+LEFT JOIN sponsors s ON s.sponsorship = si.item
+GROUP BY si.id, si.item, si.amount, si.sponsor_limit;
+
+-- One row per sponsors row with its slot amount (0 without an item) and donation
+CREATE OR REPLACE VIEW sponsor_contributions AS
+SELECT s.id AS sponsor_id,
+       s.name,
+       s.email,
+       s.mobile,
+       s.apartment,
+       s.gothram,
+       s.sponsorship,
+       CASE WHEN s.sponsorship IS NULL OR s.sponsorship = '' THEN 0
+            WHEN si.sponsor_limit > 0 THEN ROUND(si.amount / si.sponsor_limit, 2)
+            ELSE COALESCE(si.amount, 0) END AS slot_amount,
+       COALESCE(s.donation, 0) AS donation,
+       CASE WHEN s.sponsorship IS NULL OR s.sponsorship = '' THEN 0
+            WHEN si.sponsor_limit > 0 THEN ROUND(si.amount / si.sponsor_limit, 2)
+            ELSE COALESCE(si.amount, 0) END + COALESCE(s.donation, 0) AS total_amount
+FROM sponsors s
+LEFT JOIN sponsorship_items si ON si.item = s.sponsorship;
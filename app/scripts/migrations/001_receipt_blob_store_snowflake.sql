@@ -0,0 +1,7 @@
+-- Receipts move from expenses.receipt_blob into the content-addressed blob store.
+-- 1. Run this file to add the reference columns.
+-- 2. Run `python migrate_receipts_to_blob_store.py` to copy existing blobs out.
+-- 3. Once it reports no rows left, drop the old column:
+--    ALTER TABLE expenses DROP COLUMN receipt_blob;
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS receipt_sha256 STRING;
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS receipt_size INTEGER;
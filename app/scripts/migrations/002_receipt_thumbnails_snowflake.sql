@@ -0,0 +1,3 @@
+-- Gallery previews for receipts, stored in the blob store like the receipts themselves.
+-- Run this file, then `python backfill_receipt_thumbnails.py` for receipts uploaded before it.
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS receipt_thumb_sha256 STRING;
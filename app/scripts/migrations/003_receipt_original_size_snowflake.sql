@@ -0,0 +1,2 @@
+-- Receipts are normalized on upload; receipt_size is the stored size, this is the uploaded one.
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS receipt_original_size INTEGER;
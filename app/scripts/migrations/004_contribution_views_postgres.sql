@@ -0,0 +1,35 @@
+-- Canonical per-slot pricing: each sponsored slot costs amount / sponsor_limit, rounded to cents.
+-- Plain views, so they always reflect the latest writes; the app caches reads per table version
+-- (see app/cache.py) and writers to sponsors/sponsorship_items invalidate those reads.
+
+-- One row per sponsorship item with its slot price and how many slots are taken
+CREATE OR REPLACE VIEW sponsorship_item_slots AS
+SELECT si.id AS item_id,
+       si.item,
+       si.amount,
+       si.sponsor_limit,
+       ROUND(CASE WHEN si.sponsor_limit > 0 THEN si.amount / si.sponsor_limit ELSE si.amount END, 2) AS slot_amount,
+       COUNT(s.id) AS filled,
+       si.sponsor_limit - COUNT(s.id) AS remaining
+FROM sponsorship_items si
+LEFT JOIN sponsors s ON s.sponsorship = si.item
+GROUP BY si.id, si.item, si.amount, si.sponsor_limit;
+
+-- One row per sponsors row with its slot amount (0 without an item) and donation
+CREATE OR REPLACE VIEW sponsor_contributions AS
+SELECT s.id AS sponsor_id,
+       s.name,
+       s.email,
+       s.mobile,
+       s.apartment,
+       s.gothram,
+       s.sponsorship,
+       CASE WHEN s.sponsorship IS NULL OR s.sponsorship = '' THEN 0
+            WHEN si.sponsor_limit > 0 THEN ROUND(si.amount / si.sponsor_limit, 2)
+            ELSE COALESCE(si.amount, 0) END AS slot_amount,
+       COALESCE(s.donation, 0) AS donation,
+       CASE WHEN s.sponsorship IS NULL OR s.sponsorship = '' THEN 0
+            WHEN si.sponsor_limit > 0 THEN ROUND(si.amount / si.sponsor_limit, 2)
+            ELSE COALESCE(si.amount, 0) END + COALESCE(s.donation, 0) AS total_amount
+FROM sponsors s
+LEFT JOIN sponsorship_items si ON si.item = s.sponsorship;
@@ -0,0 +1,10 @@
+-- Snowflake has no secondary indexes; clustering keys give micro-partition pruning on the
+-- same hot filters instead. Automatic reclustering costs credits, so only keep the keys on
+-- tables that grow large. Check pruning with `python index_usage_report.py --snowflake`.
+ALTER TABLE expenses CLUSTER BY (status, category);
+ALTER TABLE prasad_seva CLUSTER BY (status, seva_date);
+ALTER TABLE sponsors CLUSTER BY (sponsorship);
+ALTER TABLE payment_details CLUSTER BY (payment_type, date);
+
+-- Substring search on names (the ILIKE filter) needs search optimization (Enterprise edition):
+-- ALTER TABLE prasad_seva ADD SEARCH OPTIMIZATION ON SUBSTRING(names);
@@ -0,0 +1,22 @@
+-- Indexes for the filters every tab runs. Partial indexes cover only live rows, so
+-- soft-deleted expenses/prasad_seva rows stop slowing down reads as they pile up.
+-- CONCURRENTLY avoids blocking writes; run with `psql -f` (not inside a transaction).
+-- Check usage afterwards with `python index_usage_report.py`.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Expenses list (ORDER BY category, sub_category) and summary by person
+CREATE INDEX CONCURRENTLY IF NOT EXISTS expenses_active_category_idx ON expenses (category, sub_category) WHERE status = 'active';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS expenses_active_spent_by_idx ON expenses (spent_by) WHERE status = 'active';
+
+-- Prasad Seva lists, per-day summary and the names ILIKE filter
+CREATE INDEX CONCURRENTLY IF NOT EXISTS prasad_seva_active_date_idx ON prasad_seva (seva_date, pooja_time, id) WHERE status = 'active';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS prasad_seva_active_names_trgm_idx ON prasad_seva USING gin (names gin_trgm_ops) WHERE status = 'active';
+
+-- Slot counts join on sponsorship; payment and sponsor lookups go by name
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sponsors_sponsorship_idx ON sponsors (sponsorship);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sponsors_name_idx ON sponsors (name);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS payment_details_payment_type_idx ON payment_details (payment_type);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS payment_details_name_idx ON payment_details (name);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS payment_details_date_idx ON payment_details (date DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS settlements_name_idx ON settlements (name);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS events_date_idx ON events (event_date, event_time);
@@ -0,0 +1,50 @@
+-- Adds the updated_at watermark used by pg_to_snowflake_sync.py.
+-- Existing rows get the migration time, so the first sync copies everything once.
+ALTER TABLE notification_emails ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE payment_details ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE transfers ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE sponsorship_items ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE sponsors ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE prasad_seva ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+-- updated_at is the watermark for pg_to_snowflake_sync.py; the trigger keeps it current on every UPDATE
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notification_emails_set_updated_at ON notification_emails;
+CREATE TRIGGER notification_emails_set_updated_at BEFORE UPDATE ON notification_emails FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS notification_emails_updated_at_idx ON notification_emails (updated_at);
+
+DROP TRIGGER IF EXISTS payment_details_set_updated_at ON payment_details;
+CREATE TRIGGER payment_details_set_updated_at BEFORE UPDATE ON payment_details FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS payment_details_updated_at_idx ON payment_details (updated_at);
+
+DROP TRIGGER IF EXISTS transfers_set_updated_at ON transfers;
+CREATE TRIGGER transfers_set_updated_at BEFORE UPDATE ON transfers FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS transfers_updated_at_idx ON transfers (updated_at);
+
+DROP TRIGGER IF EXISTS sponsorship_items_set_updated_at ON sponsorship_items;
+CREATE TRIGGER sponsorship_items_set_updated_at BEFORE UPDATE ON sponsorship_items FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS sponsorship_items_updated_at_idx ON sponsorship_items (updated_at);
+
+DROP TRIGGER IF EXISTS sponsors_set_updated_at ON sponsors;
+CREATE TRIGGER sponsors_set_updated_at BEFORE UPDATE ON sponsors FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS sponsors_updated_at_idx ON sponsors (updated_at);
+
+DROP TRIGGER IF EXISTS events_set_updated_at ON events;
+CREATE TRIGGER events_set_updated_at BEFORE UPDATE ON events FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS events_updated_at_idx ON events (updated_at);
+
+DROP TRIGGER IF EXISTS expenses_set_updated_at ON expenses;
+CREATE TRIGGER expenses_set_updated_at BEFORE UPDATE ON expenses FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS expenses_updated_at_idx ON expenses (updated_at);
+
+DROP TRIGGER IF EXISTS prasad_seva_set_updated_at ON prasad_seva;
+CREATE TRIGGER prasad_seva_set_updated_at BEFORE UPDATE ON prasad_seva FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE INDEX IF NOT EXISTS prasad_seva_updated_at_idx ON prasad_seva (updated_at);
@@ -0,0 +1,10 @@
+-- Sync target columns for pg_to_snowflake_sync.py; values are copied from Postgres,
+-- so no default is needed (Snowflake only accepts constant defaults on ADD COLUMN).
+ALTER TABLE notification_emails ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE payment_details ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE transfers ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE sponsorship_items ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE sponsors ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE prasad_seva ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
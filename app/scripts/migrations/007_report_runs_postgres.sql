@@ -0,0 +1,11 @@
+-- One row per delivered daily_report digest; the next run reports what changed after it
+CREATE TABLE IF NOT EXISTS report_runs (
+    id SERIAL PRIMARY KEY,
+    report VARCHAR(50) NOT NULL,
+    run_at TIMESTAMP NOT NULL,
+    last_sponsor_id INTEGER NOT NULL DEFAULT 0,
+    last_payment_id INTEGER NOT NULL DEFAULT 0,
+    last_expense_id INTEGER NOT NULL DEFAULT 0,
+    filled_item_ids TEXT
+);
+CREATE INDEX IF NOT EXISTS report_runs_report_idx ON report_runs (report, id);
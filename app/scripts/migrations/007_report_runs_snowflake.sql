@@ -0,0 +1,11 @@
+-- One row per delivered daily_report digest; the next run reports what changed after it
+CREATE TABLE IF NOT EXISTS report_runs (
+    id INTEGER AUTOINCREMENT PRIMARY KEY,
+    report STRING NOT NULL,
+    run_at TIMESTAMP NOT NULL,
+    last_sponsor_id INTEGER NOT NULL DEFAULT 0,
+    last_payment_id INTEGER NOT NULL DEFAULT 0,
+    last_expense_id INTEGER NOT NULL DEFAULT 0,
+    filled_item_ids STRING
+);
+CREATE SEQUENCE IF NOT EXISTS report_runs_id_seq START WITH 1 INCREMENT BY 1;
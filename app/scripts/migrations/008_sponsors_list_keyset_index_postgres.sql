@@ -0,0 +1,3 @@
+-- Index in the Prasad Seva Sponsors List order (see SPONSORS_SORT_KEY in app/prasad_seva.py),
+-- so each keyset page reads only its own rows. CONCURRENTLY keeps the table writable; run outside a transaction.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS prasad_seva_sponsors_list_idx ON prasad_seva (seva_date, (CASE WHEN pooja_time='Morning Pooja' THEN 0 ELSE 1 END), (COALESCE(names, '')), id) WHERE status = 'active';
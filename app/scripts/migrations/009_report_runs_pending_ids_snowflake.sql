@@ -0,0 +1,5 @@
+-- Ids inside a digest's id range that its snapshot could not see yet (their transaction was
+-- still open); the next digest checks them once more so late commits are still reported.
+ALTER TABLE report_runs ADD COLUMN IF NOT EXISTS pending_sponsor_ids STRING;
+ALTER TABLE report_runs ADD COLUMN IF NOT EXISTS pending_payment_ids STRING;
+ALTER TABLE report_runs ADD COLUMN IF NOT EXISTS pending_expense_ids STRING;
@@ -0,0 +1,3 @@
+-- Inactive expense ids seen by a digest run; the next run reports deactivations as the
+-- inactive ids missing from this list instead of trusting updated_at.
+ALTER TABLE report_runs ADD COLUMN IF NOT EXISTS inactive_expense_ids STRING;
@@ -1,47 +1,146 @@
 import streamlit as st
-import pandas as pd
 import datetime
-from .db import get_connection
-from .email_utils import send_email
+import json
+import re
+from .db import get_connection, is_snowflake
+from .cache import cached_fetchall, commit_and_invalidate
+from .outbox import enqueue_email
+from .batch import insert_many
 from .notification_utils import get_notification_emails
 import altair as alt
 
 # Place all sponsorship and donation logic here
 
+# Every headline figure on the Contributions page in one round trip
+DASHBOARD_SNAPSHOT_SQL = {
+    "postgres": """
+        WITH slots AS (
+            SELECT COALESCE(SUM(sponsor_limit), 0) AS total_slots,
+                   COALESCE(SUM(remaining), 0) AS remaining_slots,
+                   COALESCE(SUM(slot_amount * filled), 0) AS total_sponsored
+            FROM sponsorship_item_slots
+        ), donations AS (
+            SELECT COALESCE(SUM(donation), 0) AS total_donated FROM sponsors
+        ), payments AS (
+            SELECT COALESCE(SUM(amount) FILTER (WHERE payment_type = 'PayPal'), 0) AS paypal_received,
+                   COALESCE(SUM(amount) FILTER (WHERE payment_type = 'Zelle'), 0) AS zelle_received
+            FROM payment_details
+        ), spent AS (
+            SELECT COALESCE(SUM(amount), 0) AS total_expenses FROM expenses WHERE status = 'active'
+        )
+        SELECT total_slots, remaining_slots, total_sponsored, total_donated,
+               paypal_received, zelle_received, total_expenses
+        FROM slots, donations, payments, spent
+    """,
+    "snowflake": """
+        WITH slots AS (
+            SELECT COALESCE(SUM(sponsor_limit), 0) AS total_slots,
+                   COALESCE(SUM(remaining), 0) AS remaining_slots,
+                   COALESCE(SUM(slot_amount * filled), 0) AS total_sponsored
+            FROM sponsorship_item_slots
+        ), donations AS (
+            SELECT COALESCE(SUM(donation), 0) AS total_donated FROM sponsors
+        ), payments AS (
+            SELECT COALESCE(SUM(IFF(payment_type = 'PayPal', amount, 0)), 0) AS paypal_received,
+                   COALESCE(SUM(IFF(payment_type = 'Zelle', amount, 0)), 0) AS zelle_received
+            FROM payment_details
+        ), spent AS (
+            SELECT COALESCE(SUM(amount), 0) AS total_expenses FROM expenses WHERE status = 'active'
+        )
+        SELECT total_slots, remaining_slots, total_sponsored, total_donated,
+               paypal_received, zelle_received, total_expenses
+        FROM slots, donations, payments, spent
+    """,
+}
+
+
+def get_dashboard_snapshot(conn):
+    dialect = "snowflake" if is_snowflake(conn) else "postgres"
+    row = cached_fetchall(
+        conn,
+        DASHBOARD_SNAPSHOT_SQL[dialect],
+        ("sponsors", "sponsorship_items", "payment_details", "expenses"),
+    )[0]
+    total_slots, remaining_slots, total_sponsored, total_donated, paypal_received, zelle_received, total_expenses = row
+    total_sponsored = round(float(total_sponsored), 2)
+    total_donated = round(float(total_donated), 2)
+    received = float(paypal_received) + float(zelle_received)
+    return {
+        "total_slots": int(total_slots),
+        "remaining_slots": int(remaining_slots),
+        "total_sponsored": total_sponsored,
+        "total_donated": total_donated,
+        "total_combined": round(total_sponsored + total_donated, 2),
+        "paypal_received": float(paypal_received),
+        "zelle_received": float(zelle_received),
+        "received": received,
+        "total_expenses": float(total_expenses),
+        "wallet": received - float(total_expenses),
+    }
+
+
+# Slots, slot price and sponsor names for every item, grouped in the database
+ITEM_SLOTS_SQL = {
+    "postgres": """
+        SELECT v.item, v.amount, v.sponsor_limit, v.slot_amount, v.filled,
+               COALESCE(ARRAY_AGG(s.name ORDER BY s.id) FILTER (WHERE s.id IS NOT NULL), '{}') AS sponsor_names
+        FROM sponsorship_item_slots v
+        LEFT JOIN sponsors s ON s.sponsorship = v.item
+        GROUP BY v.item_id, v.item, v.amount, v.sponsor_limit, v.slot_amount, v.filled
+        ORDER BY v.item_id
+    """,
+    "snowflake": """
+        SELECT v.item, v.amount, v.sponsor_limit, v.slot_amount, v.filled,
+               ARRAY_AGG(s.name) WITHIN GROUP (ORDER BY s.id) AS sponsor_names
+        FROM sponsorship_item_slots v
+        LEFT JOIN sponsors s ON s.sponsorship = v.item
+        GROUP BY v.item_id, v.item, v.amount, v.sponsor_limit, v.slot_amount, v.filled
+        ORDER BY v.item_id
+    """,
+}
+
+
+def get_item_slots(conn):
+    dialect = "snowflake" if is_snowflake(conn) else "postgres"
+    rows = cached_fetchall(conn, ITEM_SLOTS_SQL[dialect], ("sponsors", "sponsorship_items"))
+    slots = []
+    for item, amount, limit, slot_amount, filled, names in rows:
+        # Snowflake returns ARRAY columns as JSON text
+        if isinstance(names, str):
+            names = json.loads(names)
+        slots.append({
+            "item": item,
+            "amount": amount,
+            "sponsor_limit": limit,
+            "slot_amount": slot_amount,
+            "filled": filled,
+            "remaining": limit - filled,
+            "sponsor_names": list(names or []),
+        })
+    return slots
+
+
+# A submission writes one sponsors row per item (see insert_many)
+SPONSOR_INSERT_COLUMNS = ("name", "email", "gothram", "mobile", "apartment", "sponsorship", "donation")
+
+
 def sponsorship_tab():
-    # Helper to get total approved expense amount
-    def get_total_expense_amount(conn):
-        try:
-            df = pd.read_sql("SELECT amount FROM expenses WHERE status = 'active'", conn)
-            df.columns = [c.lower() for c in df.columns]
-            if not df.empty:
-                return df["amount"].astype(float).sum()
-        except Exception:
-            pass
-        return 0.0
+    with get_connection() as conn:
+        _sponsorship_tab(conn)
+
+
+def _sponsorship_tab(conn):
     st.session_state['active_tab'] = 'Sponsorship'
-    conn = get_connection()
     cursor = conn.cursor()
 
-    # --- Combined PayPal + Zelle Total ---
-    # Get PayPal and Zelle totals from payment_details table
-    paypal_amount = 0.0
-    zelle_amount = 0.0
-    try:
-        paypal_df = pd.read_sql("SELECT amount FROM payment_details WHERE payment_type = 'PayPal'", conn)
-        paypal_df.columns = [c.lower() for c in paypal_df.columns]
-        if not paypal_df.empty:
-            paypal_amount = paypal_df["amount"].astype(float).sum()
-    except Exception:
-        paypal_amount = 0.0
-    try:
-        zelle_df = pd.read_sql("SELECT amount FROM payment_details WHERE payment_type = 'Zelle'", conn)
-        zelle_df.columns = [c.lower() for c in zelle_df.columns]
-        if not zelle_df.empty:
-            zelle_amount = zelle_df["amount"].astype(float).sum()
-    except Exception:
-        zelle_amount = 0.0
-    combined_total = paypal_amount + zelle_amount
+    # --- Dashboard snapshot (payments, slots, totals, wallet) ---
+    snapshot = get_dashboard_snapshot(conn)
+    combined_total = snapshot["received"]
+    total_slots = snapshot["total_slots"]
+    remaining_slots = snapshot["remaining_slots"]
+    total_sponsored = snapshot["total_sponsored"]
+    total_donated = snapshot["total_donated"]
+    total_combined = snapshot["total_combined"]
 
     
     st.markdown("""
@@ -66,57 +165,6 @@ def sponsorship_tab():
 
 
 
-    # --- High-level statistics ---
-    cursor.execute("SELECT item, amount, sponsor_limit FROM sponsorship_items")
-    items = cursor.fetchall()
-    total_slots = sum([row[2] for row in items])
-    cursor.execute("SELECT sponsorship, donation FROM sponsors")
-    sponsor_rows = cursor.fetchall()
-    slots_filled = {}
-    for s, _ in sponsor_rows:
-        if s:
-            slots_filled[s] = slots_filled.get(s, 0) + 1
-    remaining_slots = sum([row[2] - slots_filled.get(row[0], 0) for row in items])
-    total_donated = sum([row[1] for row in sponsor_rows if row[1]])
-    cursor.execute("SELECT item, amount, sponsor_limit FROM sponsorship_items")
-    sponsorship_items = cursor.fetchall()
-    cursor.execute("SELECT sponsorship FROM sponsors")
-    sponsored_counts = {}
-    for row in cursor.fetchall():
-        s = row[0]
-        if s:
-            sponsored_counts[s] = sponsored_counts.get(s, 0) + 1
-    total_sponsored = 0
-    for item, amount, limit in sponsorship_items:
-        count = sponsored_counts.get(item, 0)
-        if count > 0 and limit:
-            total_sponsored += (amount / limit) * count
-    total_sponsored = round(total_sponsored, 2)
-    total_donated = round(total_donated, 2)
-    total_combined = round(total_sponsored + total_donated, 2)
-    import requests
-    from bs4 import BeautifulSoup
-    paypal_link = st.secrets.get("paypal_link", "")
-    total_paypal_received = "(fetching...)"
-    if paypal_link:
-        try:
-            resp = requests.get(paypal_link, timeout=10)
-            if resp.status_code == 200:
-                soup = BeautifulSoup(resp.text, "html.parser")
-                amt_tag = soup.find(class_="poolProgressBar-amount-raised")
-                if amt_tag and amt_tag.text.strip():
-                    total_paypal_received = amt_tag.text.strip()
-                else:
-                    import re
-                    match = re.search(r'\$[0-9,.]+', resp.text)
-                    if match:
-                        total_paypal_received = match.group(0)
-                    else:
-                        total_paypal_received = "(not found)"
-            else:
-                total_paypal_received = f"(error: {resp.status_code})"
-        except Exception as e:
-            total_paypal_received = f"(error)"
     blink_style = """
 <style>
 .blink-red {
@@ -161,7 +209,7 @@ def sponsorship_tab():
         </div>
         <div style='flex:1; min-width:220px;'>
             <span style='font-size:1.1em; color:#1565c0;' title="Total funds received minus all approved expenses. This is the remaining balance available for future expenses.">Available Wallet <span style='font-size:1.1em;' title="Total funds received minus all approved expenses. This is the remaining balance available for future expenses.">🛈</span></span><br>
-            <span style='font-size:1.2em; color:#388e3c; font-weight:bold;'>${float(combined_total):,.2f}</span> - <span style='font-size:1.2em; color:#d32f2f; font-weight:bold;'>${float(get_total_expense_amount(conn)):,.2f}</span> = <span style='font-size:1.2em; color:#1565c0; font-weight:bold;'>${float(combined_total) - float(get_total_expense_amount(conn)):,.2f}</span>
+            <span style='font-size:1.2em; color:#388e3c; font-weight:bold;'>${float(combined_total):,.2f}</span> - <span style='font-size:1.2em; color:#d32f2f; font-weight:bold;'>${snapshot['total_expenses']:,.2f}</span> = <span style='font-size:1.2em; color:#1565c0; font-weight:bold;'>${snapshot['wallet']:,.2f}</span>
             <span style='font-size:1.2em; margin-left:8px;'>👛</span>
         </div>
     </div>
@@ -253,66 +301,6 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
     else:
         name = apartment = email = gothram = mobile = ""
 
-    # --- High-level statistics ---
-    # Get all sponsorship items
-    cursor.execute("SELECT item, amount, sponsor_limit FROM sponsorship_items")
-    items = cursor.fetchall()
-    total_slots = sum([row[2] for row in items])
-    # Get all sponsors
-    cursor.execute("SELECT sponsorship, donation FROM sponsors")
-    sponsor_rows = cursor.fetchall()
-    # Calculate remaining slots
-    slots_filled = {}
-    for s, _ in sponsor_rows:
-        if s:
-            slots_filled[s] = slots_filled.get(s, 0) + 1
-    remaining_slots = sum([row[2] - slots_filled.get(row[0], 0) for row in items])
-    # Calculate totals
-    total_donated = sum([row[1] for row in sponsor_rows if row[1]])
-    # Calculate total sponsored amount (sum of all sponsorships)
-    cursor.execute("SELECT item, amount, sponsor_limit FROM sponsorship_items")
-    sponsorship_items = cursor.fetchall()
-    cursor.execute("SELECT sponsorship FROM sponsors")
-    sponsored_counts = {}
-    for row in cursor.fetchall():
-        s = row[0]
-        if s:
-            sponsored_counts[s] = sponsored_counts.get(s, 0) + 1
-    total_sponsored = 0
-    for item, amount, limit in sponsorship_items:
-        count = sponsored_counts.get(item, 0)
-        if count > 0 and limit:
-            total_sponsored += (amount / limit) * count
-    total_sponsored = round(total_sponsored, 2)
-    total_donated = round(total_donated, 2)
-    total_combined = round(total_sponsored + total_donated, 2)
-    # Fetch PayPal pool amount from the public page
-    import requests
-    from bs4 import BeautifulSoup
-    paypal_link = st.secrets.get("paypal_link", "")
-    total_paypal_received = "(fetching...)"
-    if paypal_link:
-        try:
-            resp = requests.get(paypal_link, timeout=10)
-            if resp.status_code == 200:
-                soup = BeautifulSoup(resp.text, "html.parser")
-                # Try to find the amount in the page (PayPal pool pages show a progress bar with amount)
-                # Look for something like: <span class="poolProgressBar-amount-raised">$123.45</span>
-                amt_tag = soup.find(class_="poolProgressBar-amount-raised")
-                if amt_tag and amt_tag.text.strip():
-                    total_paypal_received = amt_tag.text.strip()
-                else:
-                    # Fallback: look for any $ amount in the page
-                    import re
-                    match = re.search(r'\$[0-9,.]+', resp.text)
-                    if match:
-                        total_paypal_received = match.group(0)
-                    else:
-                        total_paypal_received = "(not found)"
-            else:
-                total_paypal_received = f"(error: {resp.status_code})"
-        except Exception as e:
-            total_paypal_received = f"(error)"
     # ...existing code...
 
     tab1, tab2 = st.tabs([
@@ -320,23 +308,19 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
         "💰 Donation"
     ])
     selected_items = []
+    donation = 0
+    item_slots = get_item_slots(conn)
+    item_index = {slot["item"]: slot for slot in item_slots}
     with tab1:
-        cursor.execute("SELECT sponsorship, COUNT(*) FROM sponsors GROUP BY sponsorship")
-        counts = dict(cursor.fetchall())
-        cursor.execute("SELECT item, amount, sponsor_limit FROM sponsorship_items ORDER BY id")
-        rows = cursor.fetchall()
-        for row in rows:
-            item, cost, limit = row
-            count = counts.get(item, 0)
-            remaining = limit - count
-            # Fetch sponsor names for this item
-            cursor.execute("SELECT name FROM sponsors WHERE sponsorship = %s", (item,))
-            sponsor_names = [n[0] for n in cursor.fetchall()]
+        for slot in item_slots:
+            item, cost, limit = slot["item"], slot["amount"], slot["sponsor_limit"]
+            remaining = slot["remaining"]
+            sponsor_names = slot["sponsor_names"]
             if remaining > 0:
                 remaining_str = f"<span class='blink' style='color:#d32f2f;font-weight:bold'>{remaining}</span>"
             else:
                 remaining_str = f"{remaining}"
-            per_slot = cost / limit if limit else cost
+            per_slot = slot["slot_amount"]
             def fmt_amt(val):
                 return str(int(val)) if val == int(val) else str(val)
             # Modern card for fully sponsored items
@@ -418,7 +402,7 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
             st.markdown(donor_table_html, unsafe_allow_html=True)
         # Only show donation input if there are available slots in any item and not in donors tab
         if 'Donors' not in st.session_state.get('active_tab', ''):
-            if any((row[2] - sum([1 for s in sponsor_names if s == row[0]]) > 0) for row in items):
+            if any(slot["remaining"] > 0 for slot in item_index.values()):
                 donation = st.number_input("Enter donation amount (optional)", min_value=0, value=0)
 
     def validate_us_phone(phone):
@@ -463,38 +447,16 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
                     st.error(err)
             else:
                 try:
-                    # Calculate sponsorship item total as (amount / sponsor_limit) for each selected item
-                    sponsorship_total = 0
-                    if selected_items:
-                        format_strings = ','.join(['%s'] * len(selected_items))
-                        cursor.execute(f"SELECT amount, sponsor_limit FROM sponsorship_items WHERE item IN ({format_strings})", tuple(selected_items))
-                        sponsorship_total = sum([row[0] / row[1] if row[1] else 0 for row in cursor.fetchall()])
+                    # Slot prices come from the sponsorship_item_slots view via get_item_slots
+                    sponsorship_total = float(sum(item_index[item]["slot_amount"] for item in selected_items if item in item_index))
                     contributed_amount = sponsorship_total + (donation if donation else 0)
                     contributed_amount = round(contributed_amount, 2)
-                    for idx, item in enumerate(selected_items):
-                        d = donation if idx == 0 else 0
-                        if hasattr(cursor, 'execute') and hasattr(cursor.connection, 'account'):
-                            cursor.execute("""
-                                INSERT INTO sponsors (id, name, email, gothram, mobile, apartment, sponsorship, donation)
-                                VALUES (sponsors_id_seq.NEXTVAL, %s, %s, %s, %s, %s, %s, %s)
-                            """, (name_val, email, gothram, phone_fmt.strip(), apartment, item, d))
-                        else:
-                            cursor.execute("""
-                                INSERT INTO sponsors (name, email, gothram, mobile, apartment, sponsorship, donation)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                            """, (name_val, email, gothram, phone_fmt.strip(), apartment, item, d))
+                    # One row per item, the donation on the first; a donation alone is one row with no item
+                    contact = (name_val, email, gothram, phone_fmt.strip(), apartment)
+                    rows = [contact + (item, donation if idx == 0 else 0) for idx, item in enumerate(selected_items)]
                     if not selected_items and donation > 0:
-                        if hasattr(cursor, 'execute') and hasattr(cursor.connection, 'account'):
-                            cursor.execute("""
-                                INSERT INTO sponsors (id, name, email, gothram, mobile, apartment, sponsorship, donation)
-                                VALUES (sponsors_id_seq.NEXTVAL, %s, %s, %s, %s, %s, NULL, %s)
-                            """, (name_val, email, gothram, phone_fmt.strip(), apartment, donation))
-                        else:
-                            cursor.execute("""
-                                INSERT INTO sponsors (name, email, gothram, mobile, apartment, sponsorship, donation)
-                                VALUES (%s, %s, %s, %s, %s, NULL, %s)
-                            """, (name_val, email, gothram, phone_fmt.strip(), apartment, donation))
-                    conn.commit()
+                        rows.append(contact + (None, donation))
+                    insert_many(cursor, "sponsors", SPONSOR_INSERT_COLUMNS, rows)
                     submitted_data = {
                         "Name": name_val,
                         "Email": email,
@@ -522,7 +484,7 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
                     )
                     st.session_state['submitted_data'] = submitted_data
                     st.session_state['show_submission'] = True
-                    notification_emails = get_notification_emails()
+                    notification_emails = get_notification_emails(conn)
                     recipients = list(notification_emails)
                     if email.strip():
                         recipients.append(email.strip())
@@ -534,14 +496,9 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
   <tr><th>Mobile</th><td>{phone_fmt.strip()}</td></tr>
   <tr><th>Apartment</th><td>{apartment}</td></tr>
 """
-                    if selected_items:
-                        format_strings = ','.join(['%s'] * len(selected_items))
-                        cursor.execute(f"SELECT item, amount, sponsor_limit FROM sponsorship_items WHERE item IN ({format_strings})", tuple(selected_items))
-                        item_amounts = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
-                        for item in selected_items:
-                            amt, limit = item_amounts.get(item, (0, 1))
-                            per_item_amt = round(amt / limit, 2) if limit else amt
-                            email_rows += f"  <tr><th>Sponsorship Item</th><td>{item}</td><td><b>${per_item_amt}</b></td></tr>\n"
+                    for item in selected_items:
+                        per_item_amt = item_index[item]["slot_amount"] if item in item_index else 0
+                        email_rows += f"  <tr><th>Sponsorship Item</th><td>{item}</td><td><b>${per_item_amt}</b></td></tr>\n"
                     if donation > 0:
                         email_rows += f"  <tr><th>Donation</th><td>General Donation</td><td><b>${donation}</b></td></tr>\n"
                     if contributed_amount:
@@ -554,7 +511,9 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
                     else:
                         paypal_html += "<span style='color:#d32f2f;'>PayPal link not available.</span>"
                     paypal_html += "<br><b>For Zelle payment, pay money to any one of these persons: <span style='color:#1565C0;'>Purna Magum / Ganesh Thamma</span></b>"
-                    send_email(
+                    # Queued with the sponsor rows so a failed commit never sends a confirmation
+                    enqueue_email(
+                        cursor,
                         "Ganesh Chaturthi Celebrations Sponsorship Program in Austin Texas",
                         f"""
 <b>New Sponsorship Submission</b><br><br>
@@ -565,6 +524,7 @@ Please fill in your details below to participate in the Ganesh Chaturthi celebra
 """,
                         recipients
                     )
+                    commit_and_invalidate(conn, "sponsors")
                     st.rerun()
                 except Exception as e:
                     conn.rollback()
@@ -0,0 +1,63 @@
+import argparse
+
+import streamlit as st
+
+from app.blob_store import DEFAULT_BLOB_STORE_PATH, create_blob_store
+from app.db import open_connection
+from app.receipts import make_thumbnail
+
+# Generates gallery previews for receipts stored before thumbnails existed.
+# Run after app/scripts/migrations/002_receipt_thumbnails_*.sql; safe to re-run.
+BATCH_SIZE = 50
+
+
+def backfill_thumbnails(conn, store, batch_size=BATCH_SIZE):
+    cursor = conn.cursor()
+    done = 0
+    failed = []
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id, receipt_sha256 FROM expenses WHERE receipt_sha256 IS NOT NULL AND receipt_thumb_sha256 IS NULL AND id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for expense_id, receipt_key in rows:
+            last_id = expense_id
+            try:
+                thumb = make_thumbnail(store.get(receipt_key))
+            except FileNotFoundError:
+                thumb = None
+            if thumb is None:
+                failed.append(expense_id)
+                continue
+            cursor.execute("UPDATE expenses SET receipt_thumb_sha256=%s WHERE id=%s", (store.put(thumb), expense_id))
+            done += 1
+        conn.commit()
+        print(f"Thumbnails created: {done}")
+    cursor.close()
+    if failed:
+        print(f"Could not read (or find) receipts for expense ids: {', '.join(str(i) for i in failed)}")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create gallery thumbnails for existing expense receipts")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    store = create_blob_store(
+        st.secrets.get("blob_store_backend", "local").lower(),
+        st.secrets.get("blob_store_path", DEFAULT_BLOB_STORE_PATH),
+    )
+    conn = open_connection()
+    try:
+        backfill_thumbnails(conn, store, args.batch_size)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
+import argparse
 import psycopg2
+import psycopg2.extensions
 import pandas as pd
 import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import html
 import os
+import time
+from contextlib import contextmanager
+from string import Template
+
+from app.email_utils import SMTPMailer
 
 # Load secrets from environment or a config file
 EMAIL_SENDER = os.environ.get('EMAIL_SENDER')
@@ -20,77 +25,292 @@ DB_CONFIG = {
     'password': os.environ.get('POSTGRES_PASSWORD'),
 }
 
+DIGEST_REPORT = "daily_digest"
+
+LAST_RUN_SQL = """
+SELECT run_at, last_sponsor_id, last_payment_id, last_expense_id, filled_item_ids,
+       pending_sponsor_ids, pending_payment_ids, pending_expense_ids, inactive_expense_ids
+FROM report_runs WHERE report = %s ORDER BY id DESC LIMIT 1
+"""
+HIGH_WATER_SQL = """
+SELECT CURRENT_TIMESTAMP,
+       (SELECT COALESCE(MAX(id), 0) FROM sponsors),
+       (SELECT COALESCE(MAX(id), 0) FROM payment_details),
+       (SELECT COALESCE(MAX(id), 0) FROM expenses)
+"""
+# "New since the last run" is the id range above the last run's high-water mark, plus the ids
+# that run recorded as pending. Ids are drawn at INSERT time, not at commit, so a transaction
+# still open during a snapshot leaves a gap below the visible MAX(id) and commits later; each
+# run stores those gaps (MISSING_IDS_SQL) and the next one picks them up. A gap that is still
+# empty by then was a rollback or a delete.
+NEW_SPONSORS_SQL = "SELECT name, email, mobile, apartment, sponsorship, slot_amount, donation FROM sponsor_contributions WHERE (sponsor_id > %s AND sponsor_id <= %s) OR sponsor_id = ANY(%s) ORDER BY sponsor_id"
+NEW_PAYMENTS_SQL = "SELECT name, amount, date, payment_type, comments FROM payment_details WHERE (id > %s AND id <= %s) OR id = ANY(%s) ORDER BY id"
+NEW_EXPENSES_SQL = "SELECT category, sub_category, amount, date, spent_by, comments FROM expenses WHERE ((id > %s AND id <= %s) OR id = ANY(%s)) AND status = 'active' ORDER BY id"
+MISSING_IDS_SQL = "SELECT g FROM generate_series(%s + 1, %s) AS g WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE id = g) ORDER BY g"
+# Deactivations are found by set difference, like filled items: every run stores the ids of
+# the inactive expenses it saw, and the next one reports the inactive ids not in that list.
+# (updated_at is set at transaction start, so a deactivation committing after a snapshot can
+# carry an older timestamp than the run it missed.)
+INACTIVE_EXPENSES_SQL = "SELECT id, category, sub_category, amount, date, spent_by, comments, updated_at FROM expenses WHERE status <> 'active' ORDER BY id"
+FILLED_ITEMS_SQL = "SELECT item_id, item, amount, sponsor_limit FROM sponsorship_item_slots WHERE remaining <= 0 ORDER BY item_id"
+AVAILABLE_ITEMS_SQL = "SELECT item, amount, sponsor_limit, remaining FROM sponsorship_item_slots ORDER BY item_id"
+ROSTER_SQL = "SELECT name, email, mobile, apartment, gothram, sponsorship, slot_amount, donation, total_amount FROM sponsor_contributions ORDER BY sponsor_id"
+
+# Parsed once at import; rendering only substitutes the date and the pre-joined rows
+REPORT_TEMPLATE = Template("""
+    <b>$title - $date</b><br><br>
+    <table border='1' cellpadding='6' cellspacing='0' style='border-collapse:collapse;'>
+      <tr>$header</tr>
+      $rows
+    </table>
+""")
+
+SPONSORED_RECORDS_COLUMNS = ["Name", "Email", "Mobile", "Apartment", "Sponsorship", "Slot Amount", "Donation"]
+PAYMENTS_COLUMNS = ["Name", "Amount", "Date", "Payment Type", "Comments"]
+EXPENSES_COLUMNS = ["Category", "Sub Category", "Amount", "Date", "Spent By", "Comments"]
+FILLED_ITEMS_COLUMNS = ["Item", "Amount", "Total Slots"]
+AVAILABLE_ITEMS_COLUMNS = ["Item", "Amount", "Total Slots", "Remaining Slots"]
+
+
 def get_connection():
     return psycopg2.connect(**DB_CONFIG)
 
-def get_notification_emails(conn):
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT email FROM notification_emails")
-        return [row[0] for row in cursor.fetchall()]
-
-def send_email(subject, body, recipients):
-    for recipient in recipients:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html'))
-        try:
-            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                server.starttls()
-                server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-                server.sendmail(EMAIL_SENDER, recipient, msg.as_string())
-        except Exception as e:
-            print(f"Failed to send email to {recipient}: {e}")
-
-def report_sponsored_records(conn, recipients):
-    df = pd.read_sql("SELECT name, email, mobile, apartment, sponsorship, donation FROM sponsors ORDER BY id", conn)
-    html = """
-    <b>Daily Sponsored Records Report - {date}</b><br><br>
-    <table border='1' cellpadding='6' cellspacing='0' style='border-collapse:collapse;'>
-      <tr><th>Name</th><th>Email</th><th>Mobile</th><th>Apartment</th><th>Sponsorship</th><th>Donation</th></tr>
-    """.format(date=datetime.date.today())
-    for _, row in df.iterrows():
-        html += f"<tr><td>{row['name']}</td><td>{row['email']}</td><td>{row['mobile'] or ''}</td><td>{row['apartment']}</td><td>{row['sponsorship'] or 'N/A'}</td><td>${row['donation']}</td></tr>"
-    html += "</table>"
-    send_email(
-        "Ganesh Chaturthi Sponsorship - Daily Sponsored Records Report",
-        html,
-        recipients
-    )
 
-def report_available_items(conn, recipients):
+@contextmanager
+def stage(name, timings):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - started
+
+
+def _ids(text):
+    return [int(i) for i in (text or "").split(",") if i]
+
+
+def missing_ids(cursor, table, after_id, max_id):
+    # Ids in (after_id, max_id] this snapshot cannot see
+    cursor.execute(MISSING_IDS_SQL.format(table=table), (after_id, max_id))
+    return ",".join(str(row[0]) for row in cursor.fetchall())
+
+
+def extract(conn, full=False, attach_roster=False):
+    # Everything comes from one REPEATABLE READ snapshot. A row committed after it is either
+    # above the stored MAX(id) or one of the stored pending ids, so the next run reports it.
+    conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT email FROM notification_emails")
+            recipients = [row[0] for row in cursor.fetchall()]
+            cursor.execute(LAST_RUN_SQL, (DIGEST_REPORT,))
+            last_run = None if full else cursor.fetchone()
+            cursor.execute(HIGH_WATER_SQL)
+            run_at, sponsor_id, payment_id, expense_id = cursor.fetchone()
+            if last_run is None:
+                # First run (or --full): everything so far counts as new
+                last_run = (None, 0, 0, 0, "", "", "", "", None)
+            (since, last_sponsor_id, last_payment_id, last_expense_id, filled_ids,
+             pending_sponsor_ids, pending_payment_ids, pending_expense_ids, inactive_ids) = last_run
+            pending = (
+                missing_ids(cursor, "sponsors", last_sponsor_id, sponsor_id),
+                missing_ids(cursor, "payment_details", last_payment_id, payment_id),
+                missing_ids(cursor, "expenses", last_expense_id, expense_id),
+            )
+        previously_filled = set(_ids(filled_ids))
+        filled = pd.read_sql(FILLED_ITEMS_SQL, conn)
+        inactive = pd.read_sql(INACTIVE_EXPENSES_SQL, conn)
+        if since is None:
+            # First run: nothing counts as deactivated yet
+            deactivated = inactive.iloc[0:0]
+        elif inactive_ids is None:
+            # Last run predates inactive_expense_ids (migration 010); fall back to updated_at once
+            deactivated = inactive[inactive["updated_at"] > since]
+        else:
+            deactivated = inactive[~inactive["id"].isin(_ids(inactive_ids))]
+        data = {
+            "since": since,
+            "sponsors": pd.read_sql(NEW_SPONSORS_SQL, conn, params=(last_sponsor_id, sponsor_id, _ids(pending_sponsor_ids))),
+            "payments": pd.read_sql(NEW_PAYMENTS_SQL, conn, params=(last_payment_id, payment_id, _ids(pending_payment_ids))),
+            "filled_items": filled[~filled["item_id"].isin(previously_filled)],
+            "expenses_added": pd.read_sql(NEW_EXPENSES_SQL, conn, params=(last_expense_id, expense_id, _ids(pending_expense_ids))),
+            "expenses_deactivated": deactivated,
+            "items": pd.read_sql(AVAILABLE_ITEMS_SQL, conn),
+            "roster": pd.read_sql(ROSTER_SQL, conn) if attach_roster else None,
+        }
+        watermark = (run_at, sponsor_id, payment_id, expense_id, ",".join(str(i) for i in filled["item_id"])) + pending + (
+            ",".join(str(i) for i in inactive["id"]),
+        )
+    finally:
+        conn.rollback()
+    return recipients, data, watermark
+
+
+def record_run(conn, watermark):
+    conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_READ_COMMITTED, readonly=False)
     with conn.cursor() as cursor:
-        cursor.execute("SELECT item, amount, sponsor_limit FROM sponsorship_items ORDER BY id")
-        items = cursor.fetchall()
-        cursor.execute("SELECT sponsorship, COUNT(*) FROM sponsors GROUP BY sponsorship")
-        counts = dict(cursor.fetchall())
-    html = """
-    <b>Daily Available Sponsorship Items Report - {date}</b><br><br>
-    <table border='1' cellpadding='6' cellspacing='0' style='border-collapse:collapse;'>
-      <tr><th>Item</th><th>Amount</th><th>Total Slots</th><th>Remaining Slots</th></tr>
-    """.format(date=datetime.date.today())
-    for item, amount, limit in items:
-        count = counts.get(item, 0)
-        remaining = limit - count
-        html += f"<tr><td>{item}</td><td>${amount}</td><td>{limit}</td><td>{remaining}</td></tr>"
-    html += "</table>"
-    send_email(
-        "Ganesh Chaturthi Sponsorship - Daily Available Items Report",
-        html,
-        recipients
+        cursor.execute(
+            "INSERT INTO report_runs (report, run_at, last_sponsor_id, last_payment_id, last_expense_id, filled_item_ids, "
+            "pending_sponsor_ids, pending_payment_ids, pending_expense_ids, inactive_expense_ids) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            (DIGEST_REPORT,) + tuple(watermark),
+        )
+    conn.commit()
+
+
+def _cell(series, default=''):
+    return series.fillna(default).astype(str).map(html.escape)
+
+
+def _table_rows(cells):
+    # Column-wise string concatenation; the rows are joined once at the end
+    rows = "<tr><td>" + cells[0]
+    for column in cells[1:]:
+        rows = rows + "</td><td>" + column
+    return "".join(rows + "</td></tr>")
+
+
+def render_report(title, columns, cells, date):
+    return REPORT_TEMPLATE.substitute(
+        title=title,
+        date=date,
+        header="".join(f"<th>{c}</th>" for c in columns),
+        rows=_table_rows(cells) if len(cells[0]) else "",
     )
 
+
+def render_sponsored_records(df, title, date):
+    cells = [
+        _cell(df['name']),
+        _cell(df['email']),
+        _cell(df['mobile']),
+        _cell(df['apartment']),
+        _cell(df['sponsorship'].mask(df['sponsorship'] == ''), 'N/A'),
+        "$" + _cell(df['slot_amount']),
+        "$" + _cell(df['donation']),
+    ]
+    return render_report(title, SPONSORED_RECORDS_COLUMNS, cells, date)
+
+
+def render_payments(df, title, date):
+    cells = [
+        _cell(df['name']),
+        "$" + _cell(df['amount']),
+        _cell(df['date']),
+        _cell(df['payment_type']),
+        _cell(df['comments']),
+    ]
+    return render_report(title, PAYMENTS_COLUMNS, cells, date)
+
+
+def render_expenses(df, title, date):
+    cells = [
+        _cell(df['category']),
+        _cell(df['sub_category']),
+        "$" + _cell(df['amount']),
+        _cell(df['date']),
+        _cell(df['spent_by']),
+        _cell(df['comments']),
+    ]
+    return render_report(title, EXPENSES_COLUMNS, cells, date)
+
+
+def render_filled_items(df, title, date):
+    cells = [
+        _cell(df['item']),
+        "$" + _cell(df['amount']),
+        _cell(df['sponsor_limit']),
+    ]
+    return render_report(title, FILLED_ITEMS_COLUMNS, cells, date)
+
+
+def render_available_items(df, date):
+    cells = [
+        _cell(df['item']),
+        "$" + _cell(df['amount']),
+        _cell(df['sponsor_limit']),
+        _cell(df['remaining']),
+    ]
+    return render_report("Daily Available Sponsorship Items Report", AVAILABLE_ITEMS_COLUMNS, cells, date)
+
+
+def render_digest(data, date):
+    # Only sections with activity are included, so the email grows with the day's changes
+    since = data["since"]
+    heading = f"Changes since {since:%Y-%m-%d %H:%M}" if since is not None else "All records so far"
+    sections = [
+        ("New Sponsors", data["sponsors"], render_sponsored_records),
+        ("New Payments", data["payments"], render_payments),
+        ("Items Fully Sponsored", data["filled_items"], render_filled_items),
+        ("Expenses Added", data["expenses_added"], render_expenses),
+        ("Expenses Deactivated", data["expenses_deactivated"], render_expenses),
+    ]
+    parts = [f"<b>{heading}</b><br>"]
+    for title, df, render in sections:
+        if len(df):
+            parts.append(render(df, f"{title} ({len(df)})", date))
+    if len(parts) == 1:
+        parts.append("<br>No new sponsors, payments or expenses.")
+    return "".join(parts)
+
+
+def deliver(reports, recipients):
+    # One SMTP session for every report; each report is a single message with all
+    # recipients in the envelope
+    with SMTPMailer(SMTP_SERVER, SMTP_PORT, EMAIL_SENDER, EMAIL_PASSWORD) as mailer:
+        delivered = False
+        for subject, body, attachment, filename in reports:
+            for recipient, error in mailer.send_bulk(subject, body, recipients, attachment, filename, "text/csv").items():
+                if error:
+                    print(f"Failed to send '{subject}' to {recipient}: {error}")
+                else:
+                    delivered = True
+    return delivered
+
+
+def run_reports(conn, full=False, attach_roster=False):
+    timings = {}
+    with stage("extract", timings):
+        recipients, data, watermark = extract(conn, full, attach_roster)
+    if not recipients:
+        print("No notification emails configured.")
+        return timings
+    with stage("render", timings):
+        date = datetime.date.today()
+        roster = data["roster"]
+        reports = [
+            ("Ganesh Chaturthi Sponsorship - Daily Digest", render_digest(data, date),
+             roster.to_csv(index=False) if roster is not None else None, f"sponsors_{date}.csv"),
+            ("Ganesh Chaturthi Sponsorship - Daily Available Items Report", render_available_items(data["items"], date),
+             None, None),
+        ]
+    with stage("deliver", timings):
+        delivered = deliver(reports, recipients)
+    # The watermark only moves once someone has actually received the digest
+    if delivered:
+        with stage("record", timings):
+            record_run(conn, watermark)
+    print(f"{len(data['sponsors'])} new sponsors, {len(data['payments'])} new payments, "
+          f"{len(data['expenses_added'])} expenses added, {len(data['expenses_deactivated'])} deactivated, "
+          f"{len(recipients)} recipients")
+    return timings
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Email the daily sponsorship digest.")
+    parser.add_argument("--attach-roster", action="store_true", help="Attach the full sponsor roster as CSV")
+    parser.add_argument("--full", action="store_true", help="Report all records instead of changes since the last run")
+    args = parser.parse_args()
+
     today = datetime.date.today()
     # Only send reports until August 31st, 2025
     if today <= datetime.date(2025, 8, 31):
         conn = get_connection()
-        recipients = get_notification_emails(conn)
-        if recipients:
-            report_sponsored_records(conn, recipients)
-            report_available_items(conn, recipients)
-        conn.close()
+        try:
+            timings = run_reports(conn, args.full, args.attach_roster)
+        finally:
+            conn.close()
+        print("Timings: " + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()))
     else:
         print("Daily reports are only sent until August 31st, 2025.")
 
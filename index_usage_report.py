@@ -0,0 +1,80 @@
+import argparse
+
+import pandas as pd
+
+from app.db import open_connection
+
+# Shows whether the hot-filter indexes (migrations/005_*) are being used.
+# Postgres: scans per index and sequential vs index scans per table (counters since the last stats reset).
+# Snowflake (--snowflake): clustering depth for tables with a clustering key.
+PG_INDEX_USAGE_SQL = """
+    SELECT s.relname AS table_name,
+           s.indexrelname AS index_name,
+           s.idx_scan AS scans,
+           s.idx_tup_read AS tuples_read,
+           pg_size_pretty(pg_relation_size(s.indexrelid)) AS size
+    FROM pg_stat_user_indexes s
+    ORDER BY s.relname, s.idx_scan DESC
+"""
+
+PG_TABLE_SCANS_SQL = """
+    SELECT relname AS table_name,
+           seq_scan,
+           seq_tup_read,
+           COALESCE(idx_scan, 0) AS idx_scan,
+           n_live_tup AS live_rows,
+           n_dead_tup AS dead_rows
+    FROM pg_stat_user_tables
+    ORDER BY seq_tup_read DESC
+"""
+
+SF_CLUSTERED_TABLES_SQL = """
+    SELECT table_name, clustering_key, row_count
+    FROM information_schema.tables
+    WHERE table_schema = CURRENT_SCHEMA() AND clustering_key IS NOT NULL
+    ORDER BY table_name
+"""
+
+
+def postgres_report(conn):
+    indexes = pd.read_sql(PG_INDEX_USAGE_SQL, conn)
+    tables = pd.read_sql(PG_TABLE_SCANS_SQL, conn)
+    print("Index usage")
+    print(indexes.to_string(index=False))
+    unused = indexes[indexes["scans"] == 0]
+    if not unused.empty:
+        print(f"\nNever scanned: {', '.join(unused['index_name'])}")
+    print("\nTable scans")
+    print(tables.to_string(index=False))
+
+
+def snowflake_report(conn):
+    cursor = conn.cursor()
+    cursor.execute(SF_CLUSTERED_TABLES_SQL)
+    rows = cursor.fetchall()
+    if not rows:
+        print("No clustered tables in the current schema.")
+    for table_name, clustering_key, row_count in rows:
+        cursor.execute("SELECT SYSTEM$CLUSTERING_DEPTH(%s)", (table_name,))
+        depth = cursor.fetchone()[0]
+        print(f"{table_name}: key {clustering_key}, {row_count} rows, average depth {depth}")
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report index usage (Postgres) or clustering health (Snowflake)")
+    parser.add_argument('--snowflake', action='store_true')
+    args = parser.parse_args()
+
+    conn = open_connection("snowflake" if args.snowflake else "postgres")
+    try:
+        if args.snowflake:
+            snowflake_report(conn)
+        else:
+            postgres_report(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+
+import streamlit as st
+
+from app.blob_store import DEFAULT_BLOB_STORE_PATH, create_blob_store
+from app.db import open_connection
+
+# One-time move of expenses.receipt_blob into the blob store.
+# Run after app/scripts/migrations/001_receipt_blob_store_*.sql; safe to re-run.
+BATCH_SIZE = 20
+
+
+def migrate_receipts(conn, store, batch_size=BATCH_SIZE, drop_column=False):
+    cursor = conn.cursor()
+    moved = 0
+    total_bytes = 0
+    while True:
+        # Small batches: each blob can be several MB
+        cursor.execute(
+            "SELECT id, receipt_blob FROM expenses WHERE receipt_blob IS NOT NULL ORDER BY id LIMIT %s",
+            (batch_size,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for expense_id, blob in rows:
+            # Snowflake copies made by pg_to_snowflake_migrate.py hold hex text
+            data = bytes.fromhex(blob) if isinstance(blob, str) else bytes(blob)
+            key = store.put(data)
+            cursor.execute(
+                "UPDATE expenses SET receipt_sha256=%s, receipt_size=%s, receipt_blob=NULL WHERE id=%s",
+                (key, len(data), expense_id)
+            )
+            moved += 1
+            total_bytes += len(data)
+        # Blobs are on disk before the rows point at them
+        conn.commit()
+        print(f"Moved {moved} receipts ({total_bytes / (1024 * 1024):.1f} MB)")
+    if drop_column:
+        cursor.execute("ALTER TABLE expenses DROP COLUMN receipt_blob")
+        conn.commit()
+        print("Dropped expenses.receipt_blob")
+    cursor.close()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move expense receipts out of the database into the blob store")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--drop-column', action='store_true', help="Drop expenses.receipt_blob once everything is moved")
+    args = parser.parse_args()
+
+    store = create_blob_store(
+        st.secrets.get("blob_store_backend", "local").lower(),
+        st.secrets.get("blob_store_path", DEFAULT_BLOB_STORE_PATH),
+    )
+    conn = open_connection()
+    try:
+        moved = migrate_receipts(conn, store, args.batch_size, args.drop_column)
+        print(f"Done: {moved} receipts moved")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
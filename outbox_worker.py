@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import time
+
+from app.db import is_snowflake, open_connection
+from app.email_utils import SMTPMailer
+
+# Delivers rows queued in email_outbox by the app (see app/outbox.py).
+# Run alongside the app: `python outbox_worker.py` (or `--once` from cron). It reads the same
+# .streamlit/secrets.toml as the app, so it drains the outbox on Postgres and Snowflake alike.
+# SMTP settings come from the app's secrets (smtp_server, smtp_port, email_sender,
+# email_password); these env vars are only used where secrets.toml has none
+EMAIL_SENDER = os.environ.get('EMAIL_SENDER')
+EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD')
+SMTP_SERVER = os.environ.get('SMTP_SERVER')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+
+BATCH_SIZE = 20
+POLL_INTERVAL = 10
+# Attempts before a message is parked as 'dead'
+MAX_ATTEMPTS = 6
+# Retry after 30s, 60s, 120s, ... capped at an hour
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+# A row left in 'sending' this long (worker crashed mid-batch) is picked up again
+LOCK_TIMEOUT = 600
+
+COLUMNS = "id, subject, body, recipients, attachment, attachment_name, attachment_mime, attempts"
+
+CLAIM_SQL = f"""
+UPDATE email_outbox
+SET status = 'sending', locked_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+WHERE id IN (
+    SELECT id FROM email_outbox
+    WHERE (status IN ('pending', 'retry') AND next_attempt_at <= CURRENT_TIMESTAMP)
+       OR (status = 'sending' AND locked_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+    ORDER BY next_attempt_at, id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING {COLUMNS}
+"""
+
+# Snowflake has neither SKIP LOCKED nor RETURNING. Candidates are stamped with a locked_at
+# unique to this claim, re-checking that they are still due: Snowflake serializes UPDATEs on
+# a table, so a row another worker claimed first no longer matches. The stamp then reads
+# back exactly the rows this worker won.
+SNOWFLAKE_DUE = """(
+    (status IN ('pending', 'retry') AND next_attempt_at <= CURRENT_TIMESTAMP)
+    OR (status = 'sending' AND locked_at < DATEADD(second, -%s, CURRENT_TIMESTAMP))
+)"""
+# Server time (so LOCK_TIMEOUT compares like with like) plus random microseconds to tell
+# apart workers claiming in the same millisecond
+SNOWFLAKE_CLAIM_STAMP_SQL = (
+    "SELECT DATEADD(microsecond, UNIFORM(0, 999, RANDOM()), DATE_TRUNC('millisecond', CURRENT_TIMESTAMP))::TIMESTAMP_NTZ"
+)
+SNOWFLAKE_CANDIDATES_SQL = f"SELECT id FROM email_outbox WHERE {SNOWFLAKE_DUE} ORDER BY next_attempt_at, id LIMIT %s"
+SNOWFLAKE_CLAIM_SQL = (
+    "UPDATE email_outbox SET status = 'sending', locked_at = %s, attempts = attempts + 1 "
+    f"WHERE id IN ({{ids}}) AND {SNOWFLAKE_DUE}"
+)
+SNOWFLAKE_CLAIMED_SQL = f"SELECT {COLUMNS} FROM email_outbox WHERE status = 'sending' AND locked_at = %s AND id IN ({{ids}}) ORDER BY id"
+
+RETRY_AT_SQL = {
+    "postgres": "CURRENT_TIMESTAMP + %s * INTERVAL '1 second'",
+    "snowflake": "DATEADD(second, %s, CURRENT_TIMESTAMP)",
+}
+
+
+def get_connection():
+    # Same backend and credentials as the app (db_type and connection settings in secrets)
+    return open_connection()
+
+
+def get_mailer():
+    try:
+        return SMTPMailer.from_secrets()
+    except (KeyError, FileNotFoundError):
+        if not SMTP_SERVER:
+            raise RuntimeError("No SMTP settings: add smtp_server etc. to secrets.toml or set SMTP_SERVER")
+        return SMTPMailer(SMTP_SERVER, SMTP_PORT, EMAIL_SENDER, EMAIL_PASSWORD)
+
+
+def dialect(conn):
+    return "snowflake" if is_snowflake(conn) else "postgres"
+
+
+def backoff_seconds(attempts):
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def claim_batch(conn, batch_size):
+    # Claims are committed straight away so other workers skip these rows
+    if is_snowflake(conn):
+        return claim_batch_snowflake(conn, batch_size)
+    with conn.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, (LOCK_TIMEOUT, batch_size))
+        rows = cursor.fetchall()
+    conn.commit()
+    return rows
+
+
+def claim_batch_snowflake(conn, batch_size):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SNOWFLAKE_CANDIDATES_SQL, (LOCK_TIMEOUT, batch_size))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return []
+        cursor.execute(SNOWFLAKE_CLAIM_STAMP_SQL)
+        claim = cursor.fetchone()[0]
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(SNOWFLAKE_CLAIM_SQL.format(ids=placeholders), (claim, *ids, LOCK_TIMEOUT))
+        conn.commit()
+        cursor.execute(SNOWFLAKE_CLAIMED_SQL.format(ids=placeholders), (claim, *ids))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def mark_sent(conn, outbox_id):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE email_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, locked_at = NULL, last_error = NULL WHERE id = %s",
+            (outbox_id,)
+        )
+    finally:
+        cursor.close()
+    conn.commit()
+
+
+def mark_failed(conn, outbox_id, attempts, failed, error):
+    # Only the recipients that failed are retried, so nobody gets a duplicate
+    status = 'dead' if attempts >= MAX_ATTEMPTS else 'retry'
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE email_outbox SET status = %s, recipients = %s, last_error = %s, locked_at = NULL, "
+            f"next_attempt_at = {RETRY_AT_SQL[dialect(conn)]} WHERE id = %s",
+            (status, json.dumps(failed), error[:2000], backoff_seconds(attempts), outbox_id)
+        )
+    finally:
+        cursor.close()
+    conn.commit()
+    return status
+
+
+def deliver(conn, mailer, row):
+    outbox_id, subject, body, recipients, attachment, filename, mime_type, attempts = row
+    recipients = json.loads(recipients)
+    if attachment is not None:
+        attachment = bytes(attachment)
+    results = mailer.send(subject, body, recipients, attachment, filename, mime_type)
+    failed = [r for r, error in results.items() if error]
+    if not failed:
+        mark_sent(conn, outbox_id)
+        return 'sent'
+    error = "; ".join(f"{r}: {results[r]}" for r in failed)
+    return mark_failed(conn, outbox_id, attempts, failed, error)
+
+
+def run_once(conn, batch_size=BATCH_SIZE):
+    rows = claim_batch(conn, batch_size)
+    counts = {'sent': 0, 'retry': 0, 'dead': 0}
+    if not rows:
+        return counts
+    # One SMTP session for the whole batch
+    with get_mailer() as mailer:
+        for row in rows:
+            counts[deliver(conn, mailer, row)] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued notification emails from email_outbox")
+    parser.add_argument('--once', action='store_true', help="Process due messages once and exit")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL)
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        while True:
+            while True:
+                counts = run_once(conn, args.batch_size)
+                if any(counts.values()):
+                    print(f"Outbox batch: {counts['sent']} sent, {counts['retry']} retrying, {counts['dead']} dead")
+                # Keep draining while batches come back full
+                if sum(counts.values()) < args.batch_size:
+                    break
+            if args.once:
+                break
+            time.sleep(args.poll_interval)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
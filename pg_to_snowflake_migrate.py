@@ -1,80 +1,315 @@
-import streamlit as st
-import psycopg2
-import snowflake.connector
+import argparse
+import base64
+import csv
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Rows per exported file; each file is one FETCH from the server-side cursor and one PUT to
+# the table stage
+CHUNK_ROWS = 50000
+# CSV stand-in for NULL, so empty strings survive the round trip
+CSV_NULL = "\\N"
+# Tables copied concurrently; each worker holds one Postgres and one Snowflake connection
+DEFAULT_PARALLEL = 4
+DEFAULT_CHECKPOINT_FILE = "migrate_checkpoint.json"
+# Started first so they are not the last thing running
+LARGE_TABLES = ("expenses", "prasad_seva", "sponsors")
+
+TABLES = {
+    "payment_details": ["id", "name", "amount", "date", "comments", "payment_type", "updated_at"],
+    "transfers": ["id", "name", "phone", "email", "updated_at"],
+    "sponsorship_items": ["id", "item", "amount", "sponsor_limit", "updated_at"],
+    "sponsors": ["id", "name", "email", "mobile", "apartment", "sponsorship", "donation", "gothram", "updated_at"],
+    "events": ["id", "title", "event_date", "event_time", "link", "description", "updated_at"],
+    "expenses": ["id", "category", "sub_category", "amount", "date", "spent_by", "comments", "receipt_path", "receipt_sha256", "receipt_thumb_sha256", "receipt_size", "receipt_original_size", "status", "created_at", "updated_at"],
+    "prasad_seva": ["id", "seva_type", "names", "item_name", "num_people", "apartment", "seva_date", "pooja_time", "created_by", "created_at", "status", "updated_at"],
+    "notification_emails": ["id", "email", "updated_at"],
+}
+
 
 def get_postgres_conn():
-	return psycopg2.connect(
-		host=st.secrets["postgres_host"],
-		port=st.secrets["postgres_port"],
-		dbname=st.secrets["postgres_dbname"],
-		user=st.secrets["postgres_user"],
-		password=st.secrets["postgres_password"]
-	)
+    # Imported on use so pg_to_snowflake_sync.py can run against SQLite without the drivers
+    import psycopg2
+    import streamlit as st
+    return psycopg2.connect(
+        host=st.secrets["postgres_host"],
+        port=st.secrets["postgres_port"],
+        dbname=st.secrets["postgres_dbname"],
+        user=st.secrets["postgres_user"],
+        password=st.secrets["postgres_password"]
+    )
+
 
 def get_snowflake_conn():
-	return snowflake.connector.connect(
-		user=st.secrets["sf_user"],
-		password=st.secrets["sf_password"],
-		account=st.secrets["sf_account"],
-		warehouse=st.secrets["sf_warehouse"],
-		database=st.secrets["sf_database"],
-		schema=st.secrets["sf_schema"],
-		role=st.secrets["sf_role"]
-	)
+    import snowflake.connector
+    import streamlit as st
+    return snowflake.connector.connect(
+        user=st.secrets["sf_user"],
+        password=st.secrets["sf_password"],
+        account=st.secrets["sf_account"],
+        warehouse=st.secrets["sf_warehouse"],
+        database=st.secrets["sf_database"],
+        schema=st.secrets["sf_schema"],
+        role=st.secrets["sf_role"]
+    )
+
 
 def create_snowflake_sequence(sf_cur, table_name, start_value):
     seq_name = f"{table_name}_id_seq"
     sf_cur.execute(f"CREATE OR REPLACE SEQUENCE {seq_name} START WITH {start_value} INCREMENT BY 1")
     return seq_name
 
-def migrate_table(table_name, columns):
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _plain(value):
+    # psycopg2 hands BYTEA back as memoryview
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return value
+
+
+def write_parquet(path, columns, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    arrays = [pa.array([_plain(row[i]) for row in rows]) for i in range(len(columns))]
+    pq.write_table(pa.Table.from_arrays(arrays, names=columns), path, compression="snappy")
+
+
+def write_csv_gz(path, columns, rows):
+    # Binary values are base64 (COPY reads them back with BINARY_FORMAT = BASE64)
+    with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for row in rows:
+            out = []
+            for value in row:
+                value = _plain(value)
+                if value is None:
+                    out.append(CSV_NULL)
+                elif isinstance(value, bytes):
+                    out.append(base64.b64encode(value).decode("ascii"))
+                else:
+                    out.append(value)
+            writer.writerow(out)
+
+
+def export_chunks(pg_conn, table_name, columns, out_dir, file_format, chunk_rows=CHUNK_ROWS, after_id=0):
+    # Streams the table in id order through a server-side cursor; yields (path, rows, last_id) per file
+    write = write_parquet if file_format == "parquet" else write_csv_gz
+    suffix = "parquet" if file_format == "parquet" else "csv.gz"
+    with pg_conn.cursor(name=f"migrate_{table_name}") as pg_cur:
+        pg_cur.execute(f"SELECT {', '.join(columns)} FROM {table_name} WHERE id > %s ORDER BY id", (after_id,))
+        while True:
+            rows = pg_cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            path = os.path.join(out_dir, f"{table_name}_{rows[0][0]:012d}.{suffix}")
+            write(path, columns, rows)
+            yield path, len(rows), rows[-1][0]
+
+
+def copy_file_format(file_format):
+    if file_format == "parquet":
+        return "TYPE = PARQUET"
+    return (
+        "TYPE = CSV COMPRESSION = GZIP FIELD_OPTIONALLY_ENCLOSED_BY = '\"' "
+        # CSV_NULL, with the backslash escaped for the SQL string literal
+        "NULL_IF = ('\\\\N') EMPTY_FIELD_AS_NULL = FALSE BINARY_FORMAT = BASE64"
+    )
+
+
+def stage_file(sf_cur, table_name, path):
+    # Files are already compressed; the table stage @%<table> needs no setup
+    sf_cur.execute(f"PUT 'file://{os.path.abspath(path)}' @%{table_name} AUTO_COMPRESS = FALSE OVERWRITE = TRUE")
+
+
+def load_staged(sf_conn, table_name, columns, file_format, expected_rows):
+    # Replace the table contents in one transaction so readers never see it half loaded.
+    # FORCE: chunk files are deterministic, and COPY otherwise skips any file it loaded in
+    # the last 64 days (DELETE does not reset that load history), silently dropping its rows.
+    sf_cur = sf_conn.cursor()
+    try:
+        sf_cur.execute("BEGIN")
+        sf_cur.execute(f"DELETE FROM {table_name}")
+        if file_format == "parquet":
+            sf_cur.execute(
+                f"COPY INTO {table_name} FROM @%{table_name} FILE_FORMAT = ({copy_file_format(file_format)}) "
+                "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE FORCE = TRUE"
+            )
+        else:
+            sf_cur.execute(
+                f"COPY INTO {table_name} ({', '.join(columns)}) FROM @%{table_name} "
+                f"FILE_FORMAT = ({copy_file_format(file_format)}) FORCE = TRUE"
+            )
+        loaded = copy_rows_loaded(sf_cur)
+        if loaded != expected_rows:
+            raise RuntimeError(f"{table_name}: COPY loaded {loaded} rows, expected {expected_rows}")
+        sf_cur.execute("COMMIT")
+    except Exception:
+        sf_cur.execute("ROLLBACK")
+        raise
+    finally:
+        sf_cur.close()
+    # Files are only removed once the load committed (PURGE would drop them even on rollback),
+    # so an empty stage on resume still means the table is loaded
+    sf_cur = sf_conn.cursor()
+    try:
+        sf_cur.execute(f"REMOVE @%{table_name}")
+    finally:
+        sf_cur.close()
+
+
+def copy_rows_loaded(sf_cur):
+    # COPY returns one row per file; with no files it returns a single status-only row
+    names = [d[0].lower() for d in sf_cur.description]
+    if "rows_loaded" not in names:
+        return 0
+    index = names.index("rows_loaded")
+    return sum(row[index] or 0 for row in sf_cur.fetchall())
+
+
+def staged_files(sf_cur, table_name):
+    sf_cur.execute(f"LIST @%{table_name}")
+    return sf_cur.fetchall()
+
+
+class Checkpoint:
+    # Per-table progress shared by the worker threads, rewritten after every staged chunk:
+    # {table: {"status": "staging" | "loading" | "done", "format", "last_id", "rows", "bytes"}}
+    def __init__(self, path=DEFAULT_CHECKPOINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._tables = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._tables = json.load(f)
+
+    def get(self, table_name):
+        with self._lock:
+            return dict(self._tables.get(table_name) or {})
+
+    def update(self, table_name, **values):
+        with self._lock:
+            self._tables.setdefault(table_name, {}).update(values)
+            if self.path:
+                # Write then rename so a crash mid-write keeps the previous checkpoint
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(self._tables, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+
+
+def migrate_table(table_name, columns, chunk_rows=CHUNK_ROWS, file_format=None, checkpoint=None):
+    checkpoint = checkpoint or Checkpoint(path=None)
+    progress = checkpoint.get(table_name)
+    if progress.get("status") == "done":
+        print(f"{table_name}: already migrated, skipping")
+        return progress.get("rows", 0)
+    # A resumed table keeps the format of the files already on its stage
+    file_format = progress.get("format") or file_format or ("parquet" if parquet_available() else "csv")
     pg_conn = get_postgres_conn()
-    pg_cur = pg_conn.cursor()
     sf_conn = get_snowflake_conn()
     sf_cur = sf_conn.cursor()
+    out_dir = tempfile.mkdtemp(prefix=f"migrate_{table_name}_")
+    started = time.time()
+    try:
+        if progress.get("status") == "loading" and not staged_files(sf_cur, table_name):
+            # The load committed and purged the stage before the checkpoint was written
+            print(f"{table_name}: load finished in an earlier run")
+        else:
+            if progress.get("status") not in ("staging", "loading"):
+                # Leftovers from an unrelated run would be loaded twice
+                sf_cur.execute(f"REMOVE @%{table_name}")
+                progress = {"status": "staging", "format": file_format, "last_id": 0, "rows": 0, "bytes": 0}
+                checkpoint.update(table_name, **progress)
+            elif progress["last_id"]:
+                print(f"{table_name}: resuming after id {progress['last_id']} ({progress['rows']} rows staged)")
+            # Chunk boundaries only depend on the start id, so a chunk staged just before a crash
+            # is exported under the same file name again and overwritten rather than duplicated
+            for path, rows, last_id in export_chunks(pg_conn, table_name, columns, out_dir, file_format,
+                                                     chunk_rows, after_id=progress["last_id"]):
+                stage_file(sf_cur, table_name, path)
+                progress["bytes"] += os.path.getsize(path)
+                os.remove(path)
+                progress["rows"] += rows
+                progress["last_id"] = last_id
+                checkpoint.update(table_name, **progress)
+            checkpoint.update(table_name, status="loading")
+            load_staged(sf_conn, table_name, columns, file_format, progress["rows"])
+        # Ids are copied as-is; new rows continue after the highest one
+        sf_cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name}")
+        create_snowflake_sequence(sf_cur, table_name, start_value=sf_cur.fetchone()[0] + 1)
+        checkpoint.update(table_name, status="done")
+        elapsed = max(time.time() - started, 1e-6)
+        print(
+            f"{table_name}: {progress['rows']} rows loaded ({file_format}) in {elapsed:.1f}s, "
+            f"{progress['rows'] / elapsed:,.0f} rows/s, {progress['bytes'] / elapsed / (1024 * 1024):.2f} MB/s"
+        )
+        return progress["rows"]
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        sf_cur.close()
+        sf_conn.close()
+        pg_conn.close()
 
-    # Get max id from Postgres
-    pg_cur.execute(f"SELECT MAX(id) FROM {table_name}")
-    max_id = pg_cur.fetchone()[0] or 0
-    next_id = max_id + 1
 
-    # Create sequence for id starting from next_id
-    seq_name = create_snowflake_sequence(sf_cur, table_name, start_value=next_id)
+def migrate_tables(tables, parallel=DEFAULT_PARALLEL, chunk_rows=CHUNK_ROWS, file_format=None, checkpoint=None):
+    # Tables are independent, so each worker migrates one table on its own connections.
+    # Returns {table: error} for the tables that failed; rerunning resumes them.
+    checkpoint = checkpoint or Checkpoint(path=None)
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as pool:
+        futures = {
+            pool.submit(migrate_table, table_name, TABLES[table_name], chunk_rows, file_format, checkpoint): table_name
+            for table_name in tables
+        }
+        for future in as_completed(futures):
+            table_name = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                failures[table_name] = e
+                print(f"{table_name}: FAILED: {e}")
+    return failures
 
-    # Fetch all data from Postgres (excluding id)
-    pg_cur.execute(f"SELECT {', '.join(columns[1:])} FROM {table_name}")
-    rows = pg_cur.fetchall()
 
-    # Delete all data in Snowflake target table
-    sf_cur.execute(f"DELETE FROM {table_name}")
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-copy tables from Postgres to Snowflake.")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL, help=f"Tables migrated at once (default: {DEFAULT_PARALLEL})")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--format", choices=["parquet", "csv"], help="Staged file format (default: parquet when pyarrow is installed)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_FILE, help=f"Progress file used to resume (default: {DEFAULT_CHECKPOINT_FILE})")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and migrate every table from scratch")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    started = time.time()
+    # The big tables go first so the small ones fill the remaining workers instead of queueing behind them
+    tables = sorted(args.tables, key=lambda t: t not in LARGE_TABLES)
+    failures = migrate_tables(tables, args.parallel, args.chunk_rows, args.format, Checkpoint(args.checkpoint))
+    print(f"Finished in {time.time() - started:.1f}s; {len(tables) - len(failures)}/{len(tables)} tables migrated")
+    if failures:
+        print(f"Rerun to resume: {', '.join(sorted(failures))}")
+        sys.exit(1)
+    # A clean run starts from scratch next time
+    os.remove(args.checkpoint)
 
-    # Insert data into Snowflake with sequence id
-    if rows:
-        for row in rows:
-            row = list(row)
-            # Special handling for expenses.receipt_blob
-            if table_name == "expenses":
-                idx = columns[1:].index("receipt_blob")
-                val = row[idx]
-                if isinstance(val, memoryview):
-                    row[idx] = val.tobytes().hex()
-                elif isinstance(val, bytes):
-                    row[idx] = val.hex()
-                elif val is None:
-                    row[idx] = None
-            sf_cur.execute(f"INSERT INTO {table_name} (id, {', '.join(columns[1:])}) VALUES ({seq_name}.NEXTVAL, {', '.join(['%s'] * len(columns[1:]))})", tuple(row))
-
-    pg_cur.close()
-    pg_conn.close()
-    sf_cur.close()
-    sf_conn.close()
 
 if __name__ == "__main__":
-	migrate_table("payment_details", ["id", "name", "amount", "date", "comments", "payment_type"])
-	migrate_table("transfers", ["id", "name", "phone", "email"])
-	migrate_table("sponsorship_items", ["id", "item", "amount", "sponsor_limit"])
-	migrate_table("sponsors", ["id", "name", "email", "mobile", "apartment", "sponsorship", "donation", "gothram"])
-	migrate_table("events", ["id", "title", "event_date", "event_time", "link", "description"])
-	migrate_table("expenses", ["id", "category", "sub_category", "amount", "date", "spent_by", "comments", "receipt_path", "receipt_blob", "status", "created_at"])
-	migrate_table("prasad_seva", ["id", "seva_type", "names", "item_name", "num_people", "apartment", "seva_date", "pooja_time", "created_by", "created_at", "status"])
-	migrate_table("notification_emails", ["id", "email"])
+    main()
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pg_to_snowflake_migrate import TABLES, _plain, get_postgres_conn, get_snowflake_conn
+
+# Incremental copy of the tables in pg_to_snowflake_migrate.TABLES. Each run reads only the
+# rows whose updated_at moved past the last watermark and upserts them by id, so the target
+# stays complete while it is being refreshed. Run it from cron or with --loop.
+#
+#   python pg_to_snowflake_sync.py                                  # Postgres -> Snowflake
+#   python pg_to_snowflake_sync.py --source sqlite:///a.db --target sqlite:///b.db
+#
+# Soft deletes travel as an ordinary update of `status`. Tables without a status column are
+# small and hard-deleted by the app, so their ids are reconciled on every run instead.
+DEFAULT_STATE_FILE = "sync_state.json"
+# Rows fetched and upserted per round trip
+BATCH_ROWS = 5000
+# Rows committed shortly before the watermark can carry an older updated_at (it is set at
+# transaction start), so each run re-reads this far back; the upsert makes that harmless.
+SAFETY_LAG = timedelta(minutes=5)
+POLL_INTERVAL = 300
+
+
+class Endpoint:
+    # A connection plus the few dialect details the sync needs
+    def __init__(self, spec):
+        self.spec = spec
+        if spec.startswith("sqlite:///"):
+            self.dialect = "sqlite"
+            self.conn = sqlite3.connect(spec[len("sqlite:///"):])
+        elif spec.startswith(("postgres://", "postgresql://")):
+            import psycopg2
+            self.dialect = "postgres"
+            self.conn = psycopg2.connect(spec)
+        elif spec == "postgres":
+            self.dialect = "postgres"
+            self.conn = get_postgres_conn()
+        elif spec == "snowflake":
+            self.dialect = "snowflake"
+            self.conn = get_snowflake_conn()
+        else:
+            raise ValueError(f"Unsupported endpoint: {spec}")
+        self.param = "?" if self.dialect == "sqlite" else "%s"
+
+    def close(self):
+        self.conn.close()
+
+
+def watermark_column(columns):
+    return "updated_at" if "updated_at" in columns else "id"
+
+
+def read_after(value, column):
+    # Lower bound for the next read: the stored watermark minus the safety lag
+    if value is None or column == "id":
+        return value
+    return (datetime.fromisoformat(value) - SAFETY_LAG).isoformat(sep=" ")
+
+
+def format_watermark(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def fetch_changes(source, table_name, columns, column, after):
+    cur = source.conn.cursor()
+    sql = f"SELECT {', '.join(columns)} FROM {table_name}"
+    params = ()
+    if after is not None:
+        sql += f" WHERE {column} > {source.param}"
+        params = (after,)
+    # Rows with no watermark (written before the column existed) are picked up by the first run only
+    cur.execute(sql + f" ORDER BY {column}, id", params)
+    try:
+        while True:
+            rows = cur.fetchmany(BATCH_ROWS)
+            if not rows:
+                break
+            yield [tuple(_plain(v) for v in row) for row in rows]
+    finally:
+        cur.close()
+
+
+def upsert_rows(target, table_name, columns, rows):
+    cur = target.conn.cursor()
+    try:
+        if target.dialect == "snowflake":
+            # Bind the batch into a temp table, then apply it with one MERGE
+            batch_table = f"{table_name}_sync_batch"
+            cur.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {batch_table} LIKE {table_name}")
+            cur.execute(f"TRUNCATE TABLE {batch_table}")
+            cur.executemany(
+                f"INSERT INTO {batch_table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                rows,
+            )
+            updates = ", ".join(f"{c} = b.{c}" for c in columns if c != "id")
+            cur.execute(
+                f"MERGE INTO {table_name} t USING {batch_table} b ON t.id = b.id "
+                f"WHEN MATCHED THEN UPDATE SET {updates} "
+                f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) VALUES ({', '.join('b.' + c for c in columns)})"
+            )
+        else:
+            updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "id")
+            sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES "
+            conflict = f" ON CONFLICT (id) DO UPDATE SET {updates}"
+            if target.dialect == "postgres":
+                from psycopg2.extras import execute_values
+                execute_values(cur, sql + "%s" + conflict, rows, page_size=len(rows))
+            else:
+                cur.executemany(sql + f"({', '.join(['?'] * len(columns))})" + conflict, rows)
+        target.conn.commit()
+    finally:
+        cur.close()
+
+
+def fetch_ids(endpoint, table_name):
+    cur = endpoint.conn.cursor()
+    try:
+        cur.execute(f"SELECT id FROM {table_name}")
+        return {row[0] for row in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def prune_deleted(source, target, table_name):
+    # Hard deletes leave no row to carry a watermark; compare id sets and drop the leftovers
+    stale = sorted(fetch_ids(target, table_name) - fetch_ids(source, table_name))
+    if not stale:
+        return 0
+    cur = target.conn.cursor()
+    try:
+        for i in range(0, len(stale), BATCH_ROWS):
+            chunk = stale[i:i + BATCH_ROWS]
+            cur.execute(
+                f"DELETE FROM {table_name} WHERE id IN ({', '.join([target.param] * len(chunk))})",
+                chunk,
+            )
+        target.conn.commit()
+    finally:
+        cur.close()
+    return len(stale)
+
+
+def ensure_sequence(target, table_name):
+    # Snowflake inserts draw ids from <table>_id_seq; create it once, past the synced ids.
+    # Unlike the full migration an existing sequence is left alone.
+    if target.dialect != "snowflake":
+        return
+    cur = target.conn.cursor()
+    try:
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name}")
+        max_id = cur.fetchone()[0]
+        cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {table_name}_id_seq START WITH {max_id + 1} INCREMENT BY 1")
+    finally:
+        cur.close()
+
+
+def sync_table(source, target, table_name, columns, state):
+    column = watermark_column(columns)
+    watermark = state.get(table_name)
+    upserted = 0
+    for rows in fetch_changes(source, table_name, columns, column, read_after(watermark, column)):
+        upsert_rows(target, table_name, columns, rows)
+        upserted += len(rows)
+        last = format_watermark(rows[-1][columns.index(column)])
+        if last is not None and (watermark is None or str(last) > str(watermark)):
+            watermark = last
+    # Only the read transaction is open on the source; end it so the next run sees new commits
+    source.conn.commit()
+    deleted = 0 if "status" in columns else prune_deleted(source, target, table_name)
+    ensure_sequence(target, table_name)
+    state[table_name] = watermark
+    return upserted, deleted
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    # Write then rename so an interrupted run keeps the previous watermarks
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_once(source_spec, target_spec, tables, state_path, verify=False):
+    state = load_state(state_path)
+    source = Endpoint(source_spec)
+    target = Endpoint(target_spec)
+    try:
+        for table_name in tables:
+            started = time.time()
+            upserted, deleted = sync_table(source, target, table_name, TABLES[table_name], state)
+            # Saved per table so a failure later in the run keeps the progress made so far
+            save_state(state_path, state)
+            print(f"{table_name}: {upserted} upserted, {deleted} deleted in {time.time() - started:.1f}s "
+                  f"(watermark {state[table_name]})")
+        if verify:
+            from pg_to_snowflake_verify import verify_tables
+            # Rows written on the source since this run read them show up here until the next run
+            return not verify_tables(source, target, tables)
+        return True
+    finally:
+        target.close()
+        source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync tables from Postgres to Snowflake.")
+    parser.add_argument("--source", default="postgres",
+                        help="postgres (secrets), postgresql://... or sqlite:///path (default: postgres)")
+    parser.add_argument("--target", default="snowflake",
+                        help="snowflake (secrets), postgresql://... or sqlite:///path (default: snowflake)")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE, help=f"Watermark file (default: {DEFAULT_STATE_FILE})")
+    parser.add_argument("--loop", action="store_true", help="Keep syncing every --interval seconds")
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL)
+    parser.add_argument("--verify", action="store_true", help="Compare checksums after each run (pg_to_snowflake_verify.py)")
+    args = parser.parse_args()
+
+    while True:
+        ok = run_once(args.source, args.target, args.tables, args.state, args.verify)
+        if not args.loop:
+            sys.exit(0 if ok else 1)
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
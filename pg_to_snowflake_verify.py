@@ -0,0 +1,173 @@
+import argparse
+import sys
+
+from pg_to_snowflake_migrate import TABLES
+from pg_to_snowflake_sync import Endpoint
+
+# Compares a source and a target table without moving rows: each side returns COUNT(*) and,
+# per column, the SUM of a 60-bit slice of md5(id | value) over a canonical text rendering.
+# Sums are order independent and the id in the hash catches values swapped between rows.
+# Mismatching tables are bisected on id until the differing ranges are small.
+#
+#   python pg_to_snowflake_verify.py                       # Postgres (secrets) vs Snowflake (secrets)
+#   python pg_to_snowflake_verify.py --tables expenses --source postgresql://... --target postgresql://...
+
+# Ranges this many ids wide or fewer are reported instead of split further
+MIN_RANGE = 1000
+# Stop bisecting a table after this many differing ranges
+MAX_RANGES = 20
+
+# Canonical text per Postgres column type; both sides must render identical values identically
+CANONICAL = {
+    "postgres": {
+        "numeric": "CAST(CAST({c} AS NUMERIC(38,2)) AS TEXT)",
+        "integer": "CAST({c} AS TEXT)",
+        "date": "to_char({c}, 'YYYY-MM-DD')",
+        "time": "to_char({c}, 'HH24:MI:SS')",
+        "timestamp": "to_char({c}, 'YYYY-MM-DD HH24:MI:SS.US')",
+        "binary": "encode({c}, 'hex')",
+        "text": "CAST({c} AS TEXT)",
+    },
+    "snowflake": {
+        "numeric": "TO_VARCHAR(CAST({c} AS NUMBER(38,2)))",
+        "integer": "TO_VARCHAR({c})",
+        "date": "TO_CHAR({c}, 'YYYY-MM-DD')",
+        "time": "TO_CHAR({c}, 'HH24:MI:SS')",
+        "timestamp": "TO_CHAR({c}, 'YYYY-MM-DD HH24:MI:SS.FF6')",
+        "binary": "HEX_ENCODE({c}, 0)",
+        "text": "TO_VARCHAR({c})",
+    },
+}
+
+HASH = {
+    "postgres": "CAST(CAST('x' || substr(md5({t}), 1, 15) AS BIT(60)) AS BIGINT)",
+    "snowflake": "TO_NUMBER(UPPER(SUBSTR(MD5({t}), 1, 15)), 'XXXXXXXXXXXXXXX')",
+}
+
+PG_TYPE_KINDS = {
+    "numeric": "numeric", "real": "numeric", "double precision": "numeric",
+    "integer": "integer", "bigint": "integer", "smallint": "integer",
+    "date": "date",
+    "time without time zone": "time",
+    "timestamp without time zone": "timestamp", "timestamp with time zone": "timestamp",
+    "bytea": "binary",
+}
+
+
+def column_kinds(endpoint, table_name, columns):
+    # Types come from the Postgres side, which is the source of truth for the schema
+    cur = endpoint.conn.cursor()
+    try:
+        cur.execute(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = %s AND table_schema = current_schema()",
+            (table_name,),
+        )
+        types = dict(cur.fetchall())
+    finally:
+        cur.close()
+    return {c: PG_TYPE_KINDS.get(types.get(c), "text") for c in columns}
+
+
+def checksum_sql(dialect, table_name, kinds):
+    canonical = CANONICAL[dialect]
+    id_text = canonical["integer"].format(c="id")
+    sums = []
+    for column, kind in kinds.items():
+        value = canonical[kind].format(c=column)
+        # 'v' prefix keeps NULL apart from the string 'n'
+        token = f"{id_text} || '|' || COALESCE('v' || {value}, 'n')"
+        sums.append(f"SUM({HASH[dialect].format(t=token)})")
+    return f"SELECT COUNT(*), {', '.join(sums)} FROM {table_name} WHERE id BETWEEN %s AND %s"
+
+
+def range_checksums(endpoint, sql, lo, hi):
+    cur = endpoint.conn.cursor()
+    try:
+        cur.execute(sql, (lo, hi))
+        return [int(v or 0) for v in cur.fetchone()]
+    finally:
+        cur.close()
+
+
+def id_bounds(endpoint, table_name):
+    cur = endpoint.conn.cursor()
+    try:
+        cur.execute(f"SELECT MIN(id), MAX(id) FROM {table_name}")
+        return cur.fetchone()
+    finally:
+        cur.close()
+
+
+def verify_table(source, target, table_name, columns, min_range=MIN_RANGE, max_ranges=MAX_RANGES):
+    # Returns (source rows, target rows, [(lo, hi, differing columns)]); no ranges means identical
+    kinds = column_kinds(source, table_name, columns)
+    source_sql = checksum_sql(source.dialect, table_name, kinds)
+    target_sql = checksum_sql(target.dialect, table_name, kinds)
+    bounds = [b for b in id_bounds(source, table_name) + id_bounds(target, table_name) if b is not None]
+    if not bounds:
+        return 0, 0, []
+    lo, hi = min(bounds), max(bounds)
+    names = ["row count"] + list(kinds)
+    mismatches = []
+    # Depth-first over id ranges, splitting only the halves that still differ
+    pending = [(lo, hi)]
+    totals = None
+    while pending and len(mismatches) < max_ranges:
+        lo, hi = pending.pop()
+        expected = range_checksums(source, source_sql, lo, hi)
+        actual = range_checksums(target, target_sql, lo, hi)
+        if totals is None:
+            totals = (expected[0], actual[0])
+        if expected == actual:
+            continue
+        if hi - lo + 1 <= min_range:
+            differing = [name for name, e, a in zip(names, expected, actual) if e != a]
+            mismatches.append((lo, hi, differing))
+            continue
+        mid = (lo + hi) // 2
+        pending.append((mid + 1, hi))
+        pending.append((lo, mid))
+    source.conn.commit()
+    target.conn.commit()
+    return totals[0], totals[1], sorted(mismatches)
+
+
+def verify_tables(source, target, tables, min_range=MIN_RANGE):
+    # Prints a line per table and returns the names of the tables that differ
+    if "sqlite" in (source.dialect, target.dialect):
+        raise ValueError("Verification needs md5() on both sides; use Postgres or Snowflake endpoints")
+    failed = []
+    for table_name in tables:
+        source_rows, target_rows, mismatches = verify_table(source, target, table_name, TABLES[table_name], min_range)
+        if not mismatches:
+            print(f"{table_name}: OK ({source_rows} rows)")
+            continue
+        failed.append(table_name)
+        print(f"{table_name}: MISMATCH (source {source_rows} rows, target {target_rows} rows)")
+        for lo, hi, differing in mismatches:
+            print(f"  ids {lo}-{hi}: {', '.join(differing)}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tables between Postgres and Snowflake by checksum.")
+    parser.add_argument("--source", default="postgres", help="postgres (secrets) or postgresql://... (default: postgres)")
+    parser.add_argument("--target", default="snowflake", help="snowflake (secrets) or postgresql://... (default: snowflake)")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+    parser.add_argument("--min-range", type=int, default=MIN_RANGE, help="Stop bisecting at id ranges this wide")
+    args = parser.parse_args()
+
+    source = Endpoint(args.source)
+    target = Endpoint(args.target)
+    try:
+        failed = verify_tables(source, target, args.tables, args.min_range)
+    finally:
+        target.close()
+        source.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
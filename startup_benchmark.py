@@ -0,0 +1,79 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Measures what app.py pays for imports. Each sample runs in a fresh interpreter:
+#   cold  - first import of the module (what a new container / script run pays)
+#   rerun - importing it again in the same process (what every Streamlit rerun pays)
+# and lists the heavy libraries the import dragged in.
+#
+#   python startup_benchmark.py
+#   python startup_benchmark.py --runs 10 app.statistics
+
+# The entry point's own imports, then one target per tab
+TARGETS = [
+    "streamlit,streamlit_option_menu",
+    "app.db",
+    "app.prasad_seva",
+    "app.events",
+    "app.sponsorship",
+    "app.statistics",
+    "app.expenses",
+    "app.admin",
+]
+HEAVY_MODULES = ["psycopg2", "snowflake.connector", "PIL", "pandas", "altair", "pytz"]
+
+PROBE = """
+import importlib, json, sys, time
+names = sys.argv[1].split(",")
+before = set(sys.modules)
+started = time.perf_counter()
+for name in names:
+    importlib.import_module(name)
+cold = time.perf_counter() - started
+started = time.perf_counter()
+for name in names:
+    importlib.import_module(name)
+rerun = time.perf_counter() - started
+heavy = [m for m in sys.argv[2].split(",") if m in sys.modules and m not in before]
+print(json.dumps({"cold": cold, "rerun": rerun, "heavy": heavy}))
+"""
+
+
+def sample(target, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE, target, ",".join(HEAVY_MODULES)],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            error = out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"
+            return {"error": error}
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "cold": statistics.median(r["cold"] for r in results),
+        "rerun": statistics.median(r["rerun"] for r in results),
+        "heavy": results[0]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report cold-start and per-rerun import time of the app modules.")
+    parser.add_argument("targets", nargs="*", default=TARGETS, help="Modules to import (comma-separate to import together)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target; the median is reported")
+    args = parser.parse_args()
+
+    print(f"{'target':<36} {'cold ms':>9} {'rerun ms':>9}  heavy imports")
+    for target in args.targets:
+        result = sample(target, args.runs)
+        if "error" in result:
+            print(f"{target:<36} {'-':>9} {'-':>9}  {result['error']}")
+            continue
+        print(f"{target:<36} {result['cold'] * 1000:>9.1f} {result['rerun'] * 1000:>9.3f}  {', '.join(result['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()